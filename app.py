@@ -1,27 +1,57 @@
 from flask import Flask
+import atexit
 import os
 
 from .routes.ping_route import PingRoute
+from .routes.metrics_route import MetricsRoute
 from .routes.country_route import CountryRoute
 from .routes.auth.register_route import RegisterRoute
 from .routes.auth.sign_in_route import SignInRoute
 from .routes.me.profile_route import ProfileRoute
+from .routes.me.export_route import ExportRoute
 from .routes.profiles_route import ProfilesRoute
 from .routes.friends.add_route import AddFriendRoute
 from .routes.me.update_password_route import UpdatePasswordRoute
 from .routes.friends.remove_route import RemoveFriendRoute
 from .routes.friends.list_route import ListFriendRoute
+from .routes.friends.suggestions_route import SuggestFriendsRoute
 from .routes.posts.posts_routes import PostsRoute
 
 
+from .database.connection_pool import PostgresConnectionPool
+from .database.migrations import SchemaMigrator
 from .database.user_database import UserPostgreClient
 from .database.countries_database import CountryPostgreClient
 from .database.friend_database import FriendsPostgreClient
 from .database.posts_database import PostPostgreClient
 from .database.reactions_database import ReactionPostgreClient
+from .database.reaction_buffer import ReactionBuffer
+from .database.timeline_database import TimelinePostgreClient
+from .database.traced_cursor import TracedCursor
 
+from .modules.country_catalog import CountryCatalog
+from .modules.friend_graph import FriendGraph
+from .modules.tag_counter import TagCounter
+from .modules.ttl_cache import TTLCache
+from .modules.password_hasher import PasswordHasher
+from .modules.identity_filter import IdentityFilter
+from .modules.login_trie import LoginTrie
+from .modules.http_cache import cache_control
+from .modules.metrics import start_request, finish_request
+from .modules.query_profiler import QueryProfiler
+from .modules.compression import CompressionMiddleware, DEFAULT_RULES, parse_rules
 
 app = Flask(__name__)  # create a new Flask app instance
+if os.environ.get("COMPRESSION_ENABLED", "1") == "1":
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        level=int(os.environ.get("COMPRESSION_LEVEL", "6")),
+        rules=parse_rules(
+            os.environ.get("COMPRESSION_TYPES", ",".join(DEFAULT_RULES)),
+            int(os.environ.get("COMPRESSION_MIN_SIZE", "500")),
+        ),
+        cache_size=int(os.environ.get("COMPRESSION_CACHE_SIZE", "64")),
+    )  # gzip/deflate responses for clients that accept it
 
 port = os.environ.get(
     "SERVER_PORT"
@@ -33,30 +63,158 @@ ps_conn = os.environ.get(
 )  # get the PostgreSQL connection string from the environment variables
 
 
-user_database = UserPostgreClient(ps_conn)  # create a new user database instance
-country_database = CountryPostgreClient(
-    ps_conn
-)  # create a new country database instance
+pool = PostgresConnectionPool(
+    ps_conn,
+    min_size=int(os.environ.get("POSTGRES_POOL_MIN", "1")),
+    max_size=int(os.environ.get("POSTGRES_POOL_MAX", "10")),
+    timeout=float(os.environ.get("POSTGRES_POOL_TIMEOUT", "5")),
+    max_idle=float(os.environ.get("POSTGRES_POOL_MAX_IDLE", "300")),
+    check_interval=float(os.environ.get("POSTGRES_POOL_CHECK_INTERVAL", "30")),
+    cursor_factory=TracedCursor,
+)  # create the connection pool shared by all database clients
+
+app.before_request(pool.bind)  # reuse one pooled connection per request
+app.teardown_request(pool.release)  # return it to the pool when the request ends
+app.before_request(start_request)  # time the request and count its queries
+app.after_request(finish_request)  # record it in the metrics
+
+if os.environ.get("QUERY_PROFILER") == "1":
+    query_profiler = QueryProfiler(
+        pool,
+        budget=int(os.environ.get("QUERY_BUDGET", "10")),
+        slow_ms=float(os.environ.get("QUERY_SLOW_MS", "100")),
+        repeat_threshold=int(os.environ.get("QUERY_REPEAT_THRESHOLD", "3")),
+        explain=os.environ.get("QUERY_EXPLAIN", "1") == "1",
+        header=os.environ.get("QUERY_PROFILE_HEADER", "1") == "1",
+    )  # debugging aid: report the queries of every request
+    app.before_request(query_profiler.start)
+    app.after_request(query_profiler.finish)
+
+migrator = SchemaMigrator(pool)  # create a new schema migrator instance
+if os.environ.get("POSTGRES_MIGRATE_ON_START") == "1":
+    migrator.migrate()  # bring the schema up to date
+else:
+    migrator.check()  # refuse to start on an outdated schema
+
+principal_cache = TTLCache(
+    max_size=int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("PRINCIPAL_CACHE_TTL", "30")),
+)  # cache of authenticated users keyed on the token signature
+
+web_workers = int(
+    os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)
+)  # server processes, as started by server.py
+web_threads = int(
+    os.environ.get("WEB_THREADS", "4")
+)  # request threads per server process, as started by server.py
+
+password_hasher = PasswordHasher(
+    workers=int(
+        os.environ.get(
+            "BCRYPT_WORKERS", max(1, (os.cpu_count() or 1) // max(web_workers, 1))
+        )
+    ),
+    max_queue=int(os.environ.get("BCRYPT_MAX_QUEUE", max(1, web_threads - 1))),
+    timeout=float(os.environ.get("BCRYPT_TIMEOUT", "5")),
+)  # bcrypt runs in worker processes; one request thread is always left free
+atexit.register(password_hasher.close)  # stop the hashing processes on shutdown
+
+identity_filter = IdentityFilter(
+    capacity=int(os.environ.get("IDENTITY_FILTER_CAPACITY", "1000000")),
+    error_rate=float(os.environ.get("IDENTITY_FILTER_ERROR_RATE", "0.01")),
+    max_bytes=int(os.environ.get("IDENTITY_FILTER_MAX_BYTES", str(16 * 1024 * 1024))),
+)  # bloom filter of registered logins, emails and phones
+
+login_trie = (
+    LoginTrie(capacity=int(os.environ.get("LOGIN_TRIE_CAPACITY", "1000000")))
+    if os.environ.get("LOGIN_TRIE_ENABLED", "1") == "1"
+    else None
+)  # public logins for autocomplete; searches run in SQL without it
+
+user_database = UserPostgreClient(
+    pool,
+    principal_cache,
+    password_hasher,
+    identity_filter,
+    login_trie,
+    sync_interval=float(os.environ.get("USER_SYNC_INTERVAL", "1")),
+    principal_check_interval=float(os.environ.get("PRINCIPAL_CHECK_INTERVAL", "5")),
+)  # create a new user database instance
+user_database.warm_identity_filter()  # load the registered identities
+user_database.warm_login_trie()  # load the public logins
+country_database = CountryPostgreClient(pool)  # create a new country database instance
+friendship_cache = TTLCache(
+    max_size=int(os.environ.get("FRIENDSHIP_CACHE_SIZE", "0")),
+    ttl=float(os.environ.get("FRIENDSHIP_CACHE_TTL", "5")),
+)  # optional per-login friend sets for visibility checks
+timeline_database = TimelinePostgreClient(
+    pool,
+    fanout_limit=int(os.environ.get("TIMELINE_FANOUT_LIMIT", "1000")),
+    backfill=int(os.environ.get("TIMELINE_BACKFILL", "100")),
+)  # home timelines of friends' posts, pushed on write
+friend_graph = (
+    FriendGraph(max_paths=int(os.environ.get("FRIEND_GRAPH_MAX_PATHS", "50000")))
+    if os.environ.get("FRIEND_GRAPH_ENABLED", "1") == "1"
+    else None
+)  # friend lists in memory for suggestions; they run in SQL without it
 friend_database = FriendsPostgreClient(
-    ps_conn
+    pool,
+    friendship_cache,
+    timeline_database,
+    friend_graph,
+    graph_rebuild_interval=float(
+        os.environ.get("FRIEND_GRAPH_REBUILD_INTERVAL", "300")
+    ),
 )  # create a new friend database instances
-post_database = PostPostgreClient(ps_conn)  # create a new post database instances
+friend_database.warm_friend_graph()  # load the friend lists
+post_database = PostPostgreClient(
+    pool, friend_database, timeline_database
+)  # create a new post database instances
+reaction_buffer = (
+    ReactionBuffer(
+        pool,
+        shards=int(os.environ.get("REACTION_BUFFER_SHARDS", "16")),
+        max_pending=int(os.environ.get("REACTION_BUFFER_MAX_PENDING", "1000")),
+        flush_interval=float(os.environ.get("REACTION_BUFFER_FLUSH_INTERVAL", "0.2")),
+    )
+    if os.environ.get("REACTION_BUFFER_ENABLED") == "1"
+    else None
+)  # optional write-behind ingestion of likes and dislikes
 reactions_database = ReactionPostgreClient(
-    ps_conn
+    pool, reaction_buffer
 )  # create a new reactions database instances
+atexit.register(reactions_database.close)  # flush buffered reactions on shutdown
+
+country_catalog = CountryCatalog(
+    country_database, ttl=float(os.environ.get("COUNTRY_CATALOG_TTL", "3600"))
+)  # load the countries into memory once
+
+tag_counter = TagCounter(
+    post_database,
+    window=float(os.environ.get("TRENDING_TAGS_WINDOW", "86400")),
+    bucket=float(os.environ.get("TRENDING_TAGS_BUCKET", "3600")),
+    ttl=float(os.environ.get("TRENDING_TAGS_TTL", "300")),
+)  # recent tag counts for trending tags
+
+list_rendering = os.environ.get(
+    "LIST_RENDERING", "python"
+)  # how list endpoints build their JSON: python, sql or stream
 
 ping_route = PingRoute()  # create a new PingRoute instance
-country_route = CountryRoute(country_database)  # create a new CountryRoute instance
+metrics_route = MetricsRoute()  # create a new MetricsRoute instance
+country_route = CountryRoute(country_catalog)  # create a new CountryRoute instance
 register_route = RegisterRoute(
-    user_database, country_database
+    user_database, country_catalog
 )  # create a new RegisterRoute instance
-login_route = SignInRoute(user_database)  # create a new LoginRoute instance
+login_route = SignInRoute(
+    user_database, password_hasher
+)  # create a new LoginRoute instance
 profile_route = ProfileRoute(
-    user_database, country_database
+    user_database, country_catalog
 )  # create a new ProfileRoute instance
 profiles_route = ProfilesRoute(user_database)  # create a new ProfilesRoute instance
 update_password_route = UpdatePasswordRoute(
-    user_database
+    user_database, password_hasher
 )  # create a new UpdatePasswordRoute instance
 add_friend_route = AddFriendRoute(
     user_database, friend_database
@@ -65,20 +223,41 @@ remove_friend_route = RemoveFriendRoute(
     user_database, friend_database
 )  # create a new RemoveFriendRoute instance
 list_friend_route = ListFriendRoute(
-    user_database, friend_database
+    user_database, friend_database, list_rendering
 )  # create a new ListFriendRoute instance
+suggest_friends_route = SuggestFriendsRoute(
+    user_database, friend_database
+)  # create a new SuggestFriendsRoute instance
 new_route = PostsRoute(
-    post_database, user_database, friend_database, reactions_database
+    post_database,
+    user_database,
+    friend_database,
+    reactions_database,
+    list_rendering,
+    timeline_database,
+    tag_counter,
 )  # create a new NewRoute instance
+export_route = ExportRoute(
+    user_database, friend_database, post_database
+)  # create a new ExportRoute instance
 
+cache_control(
+    country_route.blueprint,
+    "public, max-age={}".format(os.environ.get("COUNTRIES_MAX_AGE", "300")),
+)  # countries rarely change; let shared caches keep them briefly
+cache_control(profile_route.blueprint, "private, no-cache")  # revalidate with ETag
+cache_control(profiles_route.blueprint, "private, no-cache")  # revalidate with ETag
+cache_control(new_route.blueprint, "private, no-cache")  # revalidate with ETag
 
 app.register_blueprint(ping_route.blueprint)  # register the ping route blueprint
+app.register_blueprint(metrics_route.blueprint)  # register the metrics route blueprint
 app.register_blueprint(country_route.blueprint)  # register the country route blueprint
 app.register_blueprint(
     register_route.blueprint
 )  # register the register route blueprint
 app.register_blueprint(login_route.blueprint)  # register the login route blueprint
 app.register_blueprint(profile_route.blueprint)  # register the profile route blueprint
+app.register_blueprint(export_route.blueprint)  # register the export route blueprint
 app.register_blueprint(
     profiles_route.blueprint
 )  # register the profiles route blueprint
@@ -94,6 +273,9 @@ app.register_blueprint(
 app.register_blueprint(
     list_friend_route.blueprint
 )  # register the list friend route blueprint
+app.register_blueprint(
+    suggest_friends_route.blueprint
+)  # register the suggest friends route blueprint
 app.register_blueprint(new_route.blueprint)  # register the new route blueprint
 
 if __name__ == "__main__":
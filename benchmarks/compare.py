@@ -0,0 +1,96 @@
+"""
+Compare two result files written by app.benchmarks.load.
+
+Usage:
+
+    python3 -m app.benchmarks.compare before.json after.json --fail-above 10
+
+Exits with status 1 if --fail-above is given and the p95 latency of any
+endpoint grew by more than that many percent.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional
+
+
+def change(before: float, after: float) -> Optional[float]:
+    """
+    Relative change in percent, or None if there is no baseline.
+    """
+
+    if not before:
+        return None
+    return 100.0 * (after - before) / before
+
+
+def compare(
+    before: Dict[str, Any], after: Dict[str, Any], fail_above: Optional[float]
+) -> bool:
+    """
+    Print a per-endpoint comparison table.
+
+    Args:
+        before (Dict[str, Any]): The baseline results.
+        after (Dict[str, Any]): The new results.
+        fail_above (Optional[float]): The p95 growth in percent that counts as a regression.
+
+    Returns:
+        bool: True if any endpoint regressed beyond fail_above.
+    """
+
+    columns = ["rps", "p50_ms", "p95_ms", "p99_ms"]
+    row = "{:<14}" + " {:>22}" * len(columns) + " {:>7}"
+    print(row.format("endpoint", *columns, "errors"))
+
+    endpoints = dict(before["endpoints"], total=before["total"])
+    new_endpoints = dict(after["endpoints"], total=after["total"])
+    regressed = False
+    for name in sorted(set(endpoints) | set(new_endpoints), key=lambda n: n == "total"):
+        old = endpoints.get(name)
+        new = new_endpoints.get(name)
+        if old is None or new is None:
+            print(
+                "{:<14} only in {}".format(name, "after" if old is None else "before")
+            )
+            continue
+
+        cells = []
+        for column in columns:
+            delta = change(old[column], new[column])
+            cells.append(
+                "{:.2f} -> {:.2f} ({})".format(
+                    old[column],
+                    new[column],
+                    "n/a" if delta is None else "{:+.1f}%".format(delta),
+                )
+            )
+        print(row.format(name, *cells, "{} -> {}".format(old["errors"], new["errors"])))
+
+        growth = change(old["p95_ms"], new["p95_ms"])
+        if fail_above is not None and growth is not None and growth > fail_above:
+            regressed = True
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two load test results.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--fail-above", type=float, help="fail if any p95 grows by more percent"
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    if compare(before, after, args.fail_above):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
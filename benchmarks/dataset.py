@@ -0,0 +1,27 @@
+import uuid
+from typing import List
+
+# Shared by seed and load, so the load generator can address seeded rows
+# without querying the database.
+
+PREFIX = "bench-"
+PASSWORD = "Bench-passw0rd"
+TAGS = ["news", "music", "sport", "travel", "food", "code", "art", "games"]
+
+_NAMESPACE = uuid.UUID("6f1c1f4e-5a0b-4c8e-9d43-2f1b7b0c2a11")
+
+
+def login(user: int) -> str:
+    return "{}{}".format(PREFIX, user)
+
+
+def is_public(user: int) -> bool:
+    return user % 5 != 0  # every fifth user has a private profile
+
+
+def post_id(user: int, post: int) -> str:
+    return str(uuid.uuid5(_NAMESPACE, "{}/{}".format(user, post)))
+
+
+def public_users(users: int) -> List[int]:
+    return [user for user in range(users) if is_public(user)]
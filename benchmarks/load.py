@@ -0,0 +1,342 @@
+"""
+Drive a running server with a weighted mix of requests against seeded data.
+
+Usage (after app.benchmarks.seed, from the directory containing the package):
+
+    python3 -m app.benchmarks.load --url http://localhost:8080 --users 1000 \
+        --concurrency 32 --duration 60 --output before.json
+
+    python3 -m app.benchmarks.load ... --rate 500   # open loop, 500 requests/s
+
+With --rate, latency is measured from the time a request was scheduled, so
+a server that falls behind is not hidden by the generator slowing down.
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+from . import dataset
+
+DEFAULT_MIX = "sign_in=1,feed=6,like=3,profile_get=4,profile_patch=1,countries=2"
+
+
+class Client:
+    """
+    A keep-alive HTTP client owned by a single thread.
+    """
+
+    def __init__(self, url: str, timeout: float) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.__conn: Optional[http.client.HTTPConnection] = None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Dict[str, Any]] = None,
+        token: Optional[str] = None,
+    ) -> Tuple[int, bytes]:
+        headers = {"Accept-Encoding": "gzip"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        if token is not None:
+            headers["Authorization"] = "Bearer " + token
+
+        try:
+            return self.__send(method, path, data, headers)
+        except (http.client.HTTPException, OSError):
+            # The server may have closed an idle keep-alive connection; retry once.
+            self.close()
+            return self.__send(method, path, data, headers)
+
+    def __send(
+        self, method: str, path: str, data: Optional[bytes], headers: Dict[str, str]
+    ) -> Tuple[int, bytes]:
+        if self.__conn is None:
+            self.__conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        self.__conn.request(method, path, body=data, headers=headers)
+        response = self.__conn.getresponse()
+        return response.status, response.read()
+
+    def close(self) -> None:
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+
+class Workload:
+    """
+    Builds the requests of the mix from the deterministic seeded data set.
+    """
+
+    def __init__(self, users: int, posts: int, rng: random.Random) -> None:
+        self.users = users
+        self.posts = posts
+        self.public = dataset.public_users(users)
+        self.rng = rng
+
+    def build(
+        self, operation: str, user: int
+    ) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        if operation == "sign_in":
+            body = {"login": dataset.login(user), "password": dataset.PASSWORD}
+            return "POST", "/api/auth/sign-in/", body
+        if operation == "feed":
+            author = "my" if self.rng.random() < 0.3 else None
+            author = author or dataset.login(self.rng.choice(self.public))
+            return "GET", "/api/posts/feed/{}?limit=10".format(author), None
+        if operation == "like":
+            post = dataset.post_id(
+                self.rng.choice(self.public), self.rng.randrange(max(self.posts, 1))
+            )
+            return "POST", "/api/posts/{}/like".format(post), None
+        if operation == "profile_get":
+            return "GET", "/api/me/profile/", None
+        if operation == "profile_patch":
+            image = "https://bench.example/{}.png".format(self.rng.randrange(10**6))
+            return "PATCH", "/api/me/profile/", {"image": image}
+        if operation == "countries":
+            return "GET", "/api/countries", None
+        if operation == "home":
+            return "GET", "/api/posts/home?limit=10", None
+        if operation == "friends":
+            return "POST", "/api/friends/?limit=10", None
+        raise ValueError("Unknown operation: {}".format(operation))
+
+
+class Recorder:
+    """
+    Collects latencies and status codes per operation.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, operation: str, seconds: float, status: Optional[int]) -> None:
+        with self.__lock:
+            self.latencies.setdefault(operation, []).append(seconds)
+            statuses = self.statuses.setdefault(operation, {})
+            key = str(status) if status is not None else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+            if status is None or status >= 500:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list.
+
+    Args:
+        ordered (List[float]): The sorted samples.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The sample at that rank, or 0.0 without samples.
+    """
+
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-fraction * len(ordered) // 1)))  # ceil
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies: List[float], seconds: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "rps": len(ordered) / seconds if seconds else 0.0,
+        "mean_ms": 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50_ms": 1000 * percentile(ordered, 0.50),
+        "p95_ms": 1000 * percentile(ordered, 0.95),
+        "p99_ms": 1000 * percentile(ordered, 0.99),
+        "max_ms": 1000 * ordered[-1] if ordered else 0.0,
+    }
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name:
+            mix.append((name, float(weight or 1)))
+    return mix
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    operations = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    # Sign every virtual user in once; these requests are not measured.
+    tokens: Dict[int, str] = {}
+    bootstrap = Client(args.url, args.timeout)
+    for user in range(min(args.users, args.sessions)):
+        status, body = bootstrap.request(
+            "POST",
+            "/api/auth/sign-in/",
+            {"login": dataset.login(user), "password": dataset.PASSWORD},
+        )
+        if status != 200:
+            raise SystemExit(
+                "Sign-in of {} failed: {}".format(dataset.login(user), body)
+            )
+        tokens[user] = json.loads(body)["token"]
+    bootstrap.close()
+
+    recorder = Recorder()
+    start = time.monotonic() + 0.1
+    measure_from = start + args.warmup
+    stop = measure_from + args.duration
+    schedule_lock = threading.Lock()
+    scheduled = [0]
+
+    def next_slot() -> Optional[float]:
+        if args.rate is None:
+            now = time.monotonic()
+            return now if now < stop else None
+        with schedule_lock:
+            slot = start + scheduled[0] / args.rate
+            scheduled[0] += 1
+        return slot if slot < stop else None
+
+    sessions = list(tokens)
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        workload = Workload(args.users, args.posts, rng)
+        client = Client(args.url, args.timeout)
+        while True:
+            slot = next_slot()
+            if slot is None:
+                return
+            delay = slot - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            operation = rng.choices(operations, weights)[0]
+            user = rng.choice(sessions)
+            method, path, body = workload.build(operation, user)
+            token = None if operation == "sign_in" else tokens[user]
+            try:
+                status: Optional[int] = client.request(method, path, body, token)[0]
+            except Exception:
+                status = None
+            finished = time.monotonic()
+            if slot >= measure_from:
+                recorder.add(operation, finished - slot, status)
+        client.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(args.seed + i,), daemon=True)
+        for i in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    measured = args.duration
+    everything = [
+        latency for latencies in recorder.latencies.values() for latency in latencies
+    ]
+    return {
+        "meta": {
+            "url": args.url,
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "users": args.users,
+            "posts": args.posts,
+            "sessions": len(tokens),
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+        },
+        "total": dict(
+            summarize(everything, measured), errors=sum(recorder.errors.values())
+        ),
+        "endpoints": {
+            operation: dict(
+                summarize(latencies, measured),
+                errors=recorder.errors.get(operation, 0),
+                statuses=recorder.statuses.get(operation, {}),
+            )
+            for operation, latencies in sorted(recorder.latencies.items())
+        },
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    row = "{:<14} {:>8} {:>9} {:>9} {:>9} {:>9} {:>7}"
+    print(
+        row.format("endpoint", "count", "rps", "p50 ms", "p95 ms", "p99 ms", "errors")
+    )
+    for name, stats in list(result["endpoints"].items()) + [("total", result["total"])]:
+        print(
+            row.format(
+                name,
+                stats["count"],
+                "{:.1f}".format(stats["rps"]),
+                "{:.2f}".format(stats["p50_ms"]),
+                "{:.2f}".format(stats["p95_ms"]),
+                "{:.2f}".format(stats["p99_ms"]),
+                stats["errors"],
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an endpoint load test.")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--users", type=int, default=1000, help="seeded users")
+    parser.add_argument("--posts", type=int, default=10, help="seeded posts per user")
+    parser.add_argument("--sessions", type=int, default=100, help="users signed in")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--rate", type=float, help="requests per second (open loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=2024, help="random seed")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Time the CPU-only hot paths of the models and serializers, without a database.
+
+Usage (from the directory containing the package):
+
+    python3 -m app.benchmarks.micro --baseline micro.json --save
+    python3 -m app.benchmarks.micro --baseline micro.json --check --threshold 10
+
+Every case reports the median time of one call over several repeats. With
+--check, the run exits with status 1 if any case got slower than the baseline
+by more than --threshold percent. Baselines are specific to the machine and
+the Python version they were recorded with; record them where you check them.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import timeit
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import jwt
+from flask import Flask, jsonify
+from .load import git_revision
+from ..database.user_database import UserPostgreClient
+from ..modules.friend import Friend, format_added_at
+from ..modules.post import Post
+from ..modules.process_token import TokenClient
+from ..modules.ttl_cache import TTLCache
+from ..modules.user import User
+
+PAGE_SIZE = 50
+
+NOW = datetime.datetime(2024, 3, 1, 12, 30, tzinfo=datetime.timezone.utc)
+
+
+def post_row(i: int) -> Tuple[Any, ...]:
+    # The shape of a row selected with POST_COLUMNS.
+    return (
+        str(uuid.UUID(int=i)),
+        "post number {} with some text in it".format(i),
+        "author",
+        ["tag{}".format(i % 7), "bench"],
+        NOW - datetime.timedelta(minutes=i),
+        i % 13,
+        i % 3,
+        NOW,
+    )
+
+
+def user() -> User:
+    return User(
+        "bench-user",
+        "bench@example.com",
+        "$2b$12$" + "x" * 53,
+        "RU",
+        True,
+        "+79990000000",
+        "https://example.com/avatar.png",
+        NOW,
+    )
+
+
+class _UserStore:
+    """
+    Just enough of UserPostgreClient for TokenClient.validate_token.
+    """
+
+    def __init__(self, user: User, principal_cache: TTLCache) -> None:
+        self.user = user
+        self.principal_cache = principal_cache
+        self.principal_check_interval = 5.0
+
+    def get_user_data(self, login: str) -> Optional[User]:
+        return self.user if login == self.user.login else None
+
+    def get_user_version(self, login: str) -> Optional[datetime.datetime]:
+        return self.user.updatedAt if login == self.user.login else None
+
+
+def token(user: User) -> str:
+    # Signed like the sign-in route signs tokens.
+    return jwt.encode(
+        {
+            "login": user.login,
+            "password": user.password,
+            "exp": datetime.datetime.now(datetime.timezone.utc)
+            + datetime.timedelta(days=1),
+        },
+        "secret",
+        algorithm="HS256",
+    )
+
+
+def cases() -> Dict[str, Callable[[], Any]]:
+    """
+    Build every benchmark case.
+
+    Returns:
+        Dict[str, Callable[[], Any]]: Case name -> the function to time.
+    """
+
+    rows = [post_row(i) for i in range(PAGE_SIZE)]
+    row = rows[0]
+    post = Post(*row)
+    profile_user = user()
+    friends = [(i, "friend{}".format(i), NOW) for i in range(PAGE_SIZE)]
+
+    # A cache that never keeps anything forces the full decode on every call.
+    decoding = TokenClient(_UserStore(profile_user, TTLCache(max_size=0)))
+    cached = TokenClient(_UserStore(profile_user, TTLCache(max_size=16, ttl=3600)))
+    signed = token(profile_user)
+    cached.validate_token(signed)
+
+    # check_password does not touch the pool, so no connection is needed.
+    users = UserPostgreClient.__new__(UserPostgreClient)
+
+    app = Flask(__name__)
+    posts_page = [Post(*row).post for row in rows]
+    friends_page = [
+        {"login": login, "addedAt": format_added_at(date)} for _, login, date in friends
+    ]
+
+    def jsonify_page(page: List[Dict[str, Any]]) -> Callable[[], Any]:
+        def run() -> Any:
+            with app.app_context():
+                return jsonify(page).get_data()
+
+        return run
+
+    return {
+        "post.init": lambda: Post(*row),
+        "post.post": lambda: post.post,
+        "post.page": lambda: [Post.from_row(row).post for row in rows],
+        "user.get_profile": profile_user.get_profile,
+        "friend.added_at": lambda: format_added_at(NOW),
+        "friend.page": lambda: [Friend.from_row(row).friend for row in friends],
+        "token.validate": lambda: decoding.validate_token(signed),
+        "token.validate_cached": lambda: cached.validate_token(signed),
+        "user.check_password": lambda: users.check_password("Bench-passw0rd"),
+        "jsonify.posts_page": jsonify_page(posts_page),
+        "jsonify.friends_page": jsonify_page(friends_page),
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> float:
+    """
+    Time one call of a function.
+
+    Args:
+        func (Callable[[], Any]): The function to time.
+        repeat (int): The number of timed batches.
+        min_time (float): The minimum duration of a batch in seconds.
+
+    Returns:
+        float: The median time of one call in nanoseconds.
+    """
+
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    samples = timer.repeat(repeat=repeat, number=number)
+    return 1e9 * statistics.median(samples) / number
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results = {}
+    for name, func in cases().items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(func, args.repeat, args.min_time)
+
+    return {
+        "meta": {
+            "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def check(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> bool:
+    """
+    Print the current timings next to the baseline.
+
+    Args:
+        baseline (Dict[str, Any]): A result file written with --save.
+        current (Dict[str, Any]): The results of this run.
+        threshold (float): The slowdown in percent that counts as a regression.
+
+    Returns:
+        bool: True if no case got slower by more than the threshold.
+    """
+
+    ok = True
+    row = "{:<24} {:>12} {:>12} {:>9}  {}"
+    print(row.format("case", "baseline ns", "current ns", "change", ""))
+    for name, after in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            print(row.format(name, "-", "{:.1f}".format(after), "-", "new"))
+            continue
+
+        delta = 100.0 * (after - before) / before
+        regressed = delta > threshold
+        ok = ok and not regressed
+        print(
+            row.format(
+                name,
+                "{:.1f}".format(before),
+                "{:.1f}".format(after),
+                "{:+.1f}%".format(delta),
+                "REGRESSION" if regressed else "",
+            )
+        )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks.")
+    parser.add_argument("--baseline", help="baseline file to save or check against")
+    parser.add_argument("--save", action="store_true", help="write the baseline")
+    parser.add_argument("--check", action="store_true", help="compare to baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="allowed slowdown in percent"
+    )
+    parser.add_argument("--repeat", type=int, default=7, help="timed batches")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per batch")
+    parser.add_argument("--filter", help="only run cases containing this text")
+    args = parser.parse_args()
+
+    if (args.save or args.check) and not args.baseline:
+        parser.error("--save and --check need --baseline")
+
+    result = run(args)
+
+    if args.check:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not check(baseline, result, args.threshold):
+            sys.exit(1)
+    else:
+        for name, ns in result["results"].items():
+            print("{:<24} {:>12.1f} ns".format(name, ns))
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Seed a database with a synthetic social graph for benchmarking.
+
+Usage (from the directory containing the package):
+
+    POSTGRES_CONN=... python3 -m app.benchmarks.seed \
+        --users 10000 --friends 20 --posts 10 --reactions 200000
+"""
+
+import argparse
+import datetime
+import os
+import random
+from psycopg2.extras import execute_values
+from . import dataset
+from ..database.connection_pool import PostgresConnectionPool
+from ..database.migrations import SchemaMigrator
+from ..modules.password_hasher import PasswordHasher
+
+
+def seed(
+    pool: PostgresConnectionPool,
+    users: int,
+    friends: int,
+    posts: int,
+    reactions: int,
+    rng: random.Random,
+    backfill: int = 100,
+) -> None:
+    """
+    Replace the benchmark rows with a freshly generated data set.
+
+    Args:
+        pool (PostgresConnectionPool): The connection pool.
+        users (int): The number of users.
+        friends (int): The number of friends added by each user.
+        posts (int): The number of posts written by each user.
+        reactions (int): The total number of reactions.
+        rng (random.Random): The source of randomness.
+        backfill (int): The number of each friend's latest posts copied into a
+            home timeline, like TimelinePostgreClient.follow does.
+    """
+
+    # Every benchmark user shares one password, so bcrypt runs once.
+    password = PasswordHasher().hash(dataset.PASSWORD)
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT alpha2 FROM countries ORDER BY alpha2")
+        countries = [row[0] for row in cur.fetchall()]
+        if not countries:
+            raise SystemExit("The countries table is empty")
+
+        like = dataset.PREFIX + "%"
+        cur.execute(
+            "DELETE FROM post_reactions WHERE user_login LIKE %s OR post_id IN "
+            "(SELECT id FROM posts WHERE author LIKE %s)",
+            (like, like),
+        )
+        cur.execute(
+            "DELETE FROM timelines WHERE owner LIKE %s OR author LIKE %s", (like, like)
+        )
+        cur.execute("DELETE FROM timeline_pull WHERE author LIKE %s", (like,))
+        cur.execute("DELETE FROM posts WHERE author LIKE %s", (like,))
+        cur.execute("DELETE FROM friends WHERE login LIKE %s", (like,))
+        cur.execute("DELETE FROM users WHERE login LIKE %s", (like,))
+
+        execute_values(
+            cur,
+            "INSERT INTO users (login, email, password, countryCode, isPublic) VALUES %s",
+            (
+                (
+                    dataset.login(user),
+                    "{}@bench.example".format(dataset.login(user)),
+                    password,
+                    rng.choice(countries),
+                    dataset.is_public(user),
+                )
+                for user in range(users)
+            ),
+            page_size=1000,
+        )
+        print("users: {}".format(users))
+
+        execute_values(
+            cur,
+            """
+            INSERT INTO friends (login, friendLogin, date) VALUES %s
+            ON CONFLICT (login, friendLogin) DO NOTHING
+            """,
+            (
+                (
+                    dataset.login(user),
+                    dataset.login(friend),
+                    now - datetime.timedelta(seconds=rng.randrange(90 * 86400)),
+                )
+                for user in range(users)
+                for friend in rng.sample(range(users), min(friends, users))
+                if friend != user
+            ),
+            page_size=1000,
+        )
+        print("friends: ~{}".format(users * friends))
+
+        execute_values(
+            cur,
+            "INSERT INTO posts (id, content, author, tags, createdAt, updatedAt) VALUES %s",
+            (
+                (
+                    dataset.post_id(user, post),
+                    "Benchmark post {} by {}".format(post, dataset.login(user)),
+                    dataset.login(user),
+                    rng.sample(dataset.TAGS, rng.randint(0, 3)),
+                    created_at,
+                    created_at,
+                )
+                for user in range(users)
+                for post in range(posts)
+                for created_at in [
+                    now - datetime.timedelta(seconds=rng.randrange(90 * 86400))
+                ]
+            ),
+            page_size=1000,
+        )
+        print("posts: {}".format(users * posts))
+
+        # The friendships were not added through the API, so fill the home
+        # timelines the way TimelinePostgreClient.follow would have.
+        cur.execute(
+            """
+            INSERT INTO timelines (owner, post_id, author, createdAt)
+            SELECT f.login, p.id, p.author, p.createdAt FROM friends f
+            CROSS JOIN LATERAL (
+                SELECT id, author, createdAt FROM posts
+                WHERE author = f.friendLogin
+                    AND NOT EXISTS (
+                        SELECT 1 FROM timeline_pull WHERE author = f.friendLogin
+                    )
+                ORDER BY createdAt DESC, id DESC
+                LIMIT %s
+            ) p
+            WHERE f.login LIKE %s
+            ON CONFLICT DO NOTHING
+            """,
+            (backfill, like),
+        )
+        print("timeline rows: {}".format(cur.rowcount))
+
+        if posts:
+            execute_values(
+                cur,
+                """
+                INSERT INTO post_reactions (post_id, user_login, reaction) VALUES %s
+                ON CONFLICT (post_id, user_login) DO NOTHING
+                """,
+                (
+                    (
+                        dataset.post_id(rng.randrange(users), rng.randrange(posts)),
+                        dataset.login(rng.randrange(users)),
+                        "like" if rng.random() < 0.8 else "dislike",
+                    )
+                    for _ in range(reactions)
+                ),
+                page_size=1000,
+            )
+            cur.execute(
+                """
+                UPDATE posts SET
+                    likesCount = counts.likes,
+                    dislikesCount = counts.dislikes
+                FROM (
+                    SELECT
+                        post_id,
+                        COUNT(*) FILTER (WHERE reaction = 'like') AS likes,
+                        COUNT(*) FILTER (WHERE reaction = 'dislike') AS dislikes
+                    FROM post_reactions
+                    WHERE post_id IN (SELECT id FROM posts WHERE author LIKE %s)
+                    GROUP BY post_id
+                ) counts
+                WHERE posts.id = counts.post_id
+                """,
+                (like,),
+            )
+        print("reactions: ~{}".format(reactions))
+
+        cur.execute("ANALYZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed benchmark data.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--friends", type=int, default=20, help="friends per user")
+    parser.add_argument("--posts", type=int, default=10, help="posts per user")
+    parser.add_argument("--reactions", type=int, default=10000, help="total")
+    parser.add_argument(
+        "--backfill", type=int, default=100, help="timeline posts per friend"
+    )
+    parser.add_argument("--seed", type=int, default=2024, help="random seed")
+    args = parser.parse_args()
+
+    pool = PostgresConnectionPool(os.environ.get("POSTGRES_CONN"), min_size=0)
+    SchemaMigrator(pool).migrate()
+    seed(
+        pool,
+        args.users,
+        args.friends,
+        args.posts,
+        args.reactions,
+        random.Random(args.seed),
+        args.backfill,
+    )
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import psycopg2
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no connection becomes available within the pool wait timeout.
+    """
+
+
+class PostgresConnectionPool:
+    """
+    A thread-safe pool of PostgreSQL connections shared by all *PostgreClient classes.
+    """
+
+    def __init__(
+        self,
+        ps_connect: Optional[str],
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_idle: float = 300.0,
+        check_interval: float = 30.0,
+        cursor_factory: Optional[Any] = None,
+    ) -> None:
+        """
+        Initialize the pool and open min_size connections.
+
+        Args:
+            ps_connect (str): The PostgreSQL connection string.
+            min_size (int): The number of connections kept open even when idle.
+            max_size (int): The maximum number of open connections.
+            timeout (float): Seconds to wait for a free connection before giving up.
+            max_idle (float): Seconds after which an idle connection above min_size is closed.
+            check_interval (float): Connections idle for longer than this are pinged on checkout.
+            cursor_factory (Optional[Any]): The cursor class used by every connection.
+        Raises:
+            ValueError: If ps_connect is None or the sizes are inconsistent.
+        """
+
+        if ps_connect is None:
+            raise ValueError("ps_connect cannot be None")
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size")
+
+        self.ps_conn = ps_connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.cursor_factory = cursor_factory
+
+        self.__idle: List[Tuple[Any, float]] = []  # (connection, returned at)
+        self.__size = 0  # connections currently open, idle or checked out
+        self.__condition = threading.Condition()
+        self.__local = threading.local()
+
+        for _ in range(min_size):
+            self.__idle.append((self.__open(), time.monotonic()))
+            self.__size += 1
+
+    def __open(self) -> Any:
+        if self.cursor_factory is not None:
+            return psycopg2.connect(self.ps_conn, cursor_factory=self.cursor_factory)
+        return psycopg2.connect(self.ps_conn)
+
+    def __is_healthy(self, conn: Any, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_interval:
+            return True
+
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def __discard(self, conn: Any) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def __reap_idle(self) -> List[Any]:
+        # Must be called with the condition held; returns connections to close.
+        now = time.monotonic()
+        reaped = []
+        while self.__size > self.min_size and self.__idle:
+            conn, idle_since = self.__idle[0]
+            if now - idle_since < self.max_idle:
+                break
+            self.__idle.pop(0)
+            self.__size -= 1
+            reaped.append(conn)
+        return reaped
+
+    def getconn(self) -> Any:
+        """
+        Check out a healthy connection, opening a new one if the pool is not full.
+
+        Returns:
+            connection: A psycopg2 connection owned by the caller until putconn.
+        Raises:
+            PoolTimeoutError: If the pool stays exhausted for longer than the timeout.
+        """
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self.__condition:
+                reaped = self.__reap_idle()
+                candidate = None
+                while candidate is None:
+                    if self.__idle:
+                        # Most recently returned connections are the warmest.
+                        candidate = self.__idle.pop()
+                    elif self.__size < self.max_size:
+                        self.__size += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeoutError("Connection pool exhausted")
+                        self.__condition.wait(remaining)
+
+            for conn in reaped:
+                self.__discard(conn)
+
+            if candidate is None:
+                try:
+                    return self.__open()
+                except:
+                    with self.__condition:
+                        self.__size -= 1
+                        self.__condition.notify()
+                    raise
+
+            conn, idle_since = candidate
+            if self.__is_healthy(conn, idle_since):
+                return conn
+
+            self.__discard(conn)
+            with self.__condition:
+                self.__size -= 1
+                self.__condition.notify()
+
+    def putconn(self, conn: Any) -> None:
+        """
+        Return a connection to the pool, rolling back any unfinished transaction.
+
+        Args:
+            conn (connection): A connection previously obtained from getconn.
+        """
+
+        if not conn.closed:
+            try:
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+            except psycopg2.Error:
+                self.__discard(conn)
+
+        with self.__condition:
+            if conn.closed:
+                self.__size -= 1
+            else:
+                self.__idle.append((conn, time.monotonic()))
+            self.__condition.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Provide a connection for one unit of work, committing on success and rolling back on error.
+
+        If the current thread has a request-scoped connection bound, it is reused
+        instead of checking out a new one. Calls nested inside another
+        connection() on the same thread share its connection and transaction;
+        only the outermost one commits or rolls back.
+
+        Yields:
+            connection: A psycopg2 connection.
+        """
+
+        depth = getattr(self.__local, "depth", 0)
+        conn = getattr(self.__local, "conn", None)
+        pinned = conn is None and not getattr(self.__local, "scoped", False)
+        if conn is None:
+            conn = self.__local.conn = self.getconn()
+
+        self.__local.depth = depth + 1
+        try:
+            yield conn
+            if depth == 0 and not conn.closed:
+                conn.commit()
+        except:
+            if depth == 0 and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.__local.depth = depth
+            if pinned:
+                # Outside a request scope the connection is only pinned for
+                # the duration of the outermost call.
+                self.__local.conn = None
+                self.putconn(conn)
+
+    def bind(self) -> None:
+        """
+        Start a request scope on the current thread.
+
+        The first connection() call inside the scope checks out a connection and
+        keeps it pinned to the thread, so every later call reuses it until release.
+        """
+
+        self.__local.scoped = True
+
+    def release(self, *_: Any) -> None:
+        """
+        End the request scope and return the pinned connection, if any, to the pool.
+        """
+
+        self.__local.scoped = False
+        conn = getattr(self.__local, "conn", None)
+        if conn is not None:
+            self.__local.conn = None
+            self.putconn(conn)
+
+    def close_all(self) -> None:
+        """
+        Close every idle connection held by the pool.
+        """
+
+        with self.__condition:
+            idle, self.__idle = self.__idle, []
+            self.__size -= len(idle)
+        for conn, _ in idle:
+            self.__discard(conn)
+
+    def stream(
+        self, query: str, params: Any = None, chunk_size: int = 500
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Run a query on a server-side cursor and yield its rows in chunks.
+
+        The generator checks out a connection of its own rather than the
+        request-scoped one, since a streamed response outlives the request
+        scope, and returns it once exhausted or closed.
+
+        Args:
+            query (str): The SQL query.
+            params (Any): The query parameters.
+            chunk_size (int): The number of rows fetched per round trip.
+
+        Yields:
+            List[Tuple[Any, ...]]: The next chunk of at most chunk_size rows.
+        """
+
+        conn = self.getconn()
+        try:
+            cur = conn.cursor(name="stream_{}".format(id(conn)))
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            cur.close()
+        finally:
+            self.putconn(conn)
@@ -1,19 +1,19 @@
-import psycopg2
 from typing import Optional, Any
+from .connection_pool import PostgresConnectionPool
+from ..modules.metrics import instrumented
 
 
+@instrumented
 class CountryPostgreClient:
-    def __init__(self, ps_connect: Optional[str]) -> None:
+    def __init__(self, pool: PostgresConnectionPool) -> None:
         """
-        Initialize the CountryPostgreClient with a PostgreSQL connection string.
+        Initialize the CountryPostgreClient with a PostgreSQL connection pool.
 
         Args:
-        - ps_connect: A string representing the PostgreSQL connection string.
+        - pool: The shared PostgresConnectionPool.
         """
 
-        if ps_connect is None:
-            raise ValueError("ps_connect cannot be None")
-        self.ps_conn = ps_connect
+        self.pool = pool
 
     def filter_region(self, region: Optional[str]) -> Any:
         """
@@ -26,7 +26,7 @@ class CountryPostgreClient:
         - A list of country information matching the specified region, or all countries if no region is provided.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
             if region:
                 cur.execute(
@@ -37,7 +37,7 @@ class CountryPostgreClient:
                 cur.execute(
                     "SELECT name, alpha2, alpha3, region FROM countries ORDER BY alpha2"
                 )
-        return cur.fetchall()
+            return cur.fetchall()
 
     def get_country_by_alpha(self, alpha2: str) -> Any:
         """
@@ -50,7 +50,7 @@ class CountryPostgreClient:
         - Country information matching the specified alpha2 code.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
             cur.execute(
                 "SELECT name, alpha2, alpha3, region FROM countries WHERE alpha2 = %s",
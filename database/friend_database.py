@@ -1,71 +1,249 @@
-import psycopg2
-from typing import Any, List, Dict
+import logging
+import os
+import threading
+import time
+from typing import Any, Iterator, List, Dict, Optional, Tuple
+from .connection_pool import PostgresConnectionPool
+from .row_factory import model_cursor
+from .timeline_database import TimelinePostgreClient
+from ..modules.friend import Friend
+from ..modules.friend_graph import FriendGraph
+from ..modules.pagination import encode_cursor, decode_cursor
+from ..modules.ttl_cache import TTLCache
+from ..modules.metrics import instrumented
 
+logger = logging.getLogger(__name__)
 
+# Renders addedAt exactly like format_added_at.
+_ADDED_AT_SQL = """
+    to_char(date, 'YYYY-MM-DD"T"HH24:MI:SS') || 'Z'
+    || substr(to_char(date, 'TZH'), 2) || ':' || to_char(date, 'TZM')
+"""
+
+
+@instrumented
 class FriendsPostgreClient:
-    def __init__(self, ps_conn: str) -> None:
-        self.ps_conn = ps_conn
-        self.init_database()
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        friendship_cache: Optional[TTLCache] = None,
+        timeline_database: Optional[TimelinePostgreClient] = None,
+        friend_graph: Optional[FriendGraph] = None,
+        graph_rebuild_interval: float = 300.0,
+    ) -> None:
+        self.pool = pool
+        # login -> frozenset of the logins they added; disabled unless provided.
+        self.friendship_cache = (
+            friendship_cache if friendship_cache is not None else TTLCache(max_size=0)
+        )
+        # Home timelines follow friend list changes when provided.
+        self.timeline_database = timeline_database
+        # Friend suggestions are computed in memory when provided; the graph is
+        # rebuilt from the table every graph_rebuild_interval seconds to pick up
+        # the changes made through other processes.
+        self.friend_graph = friend_graph
+        self.graph_rebuild_interval = graph_rebuild_interval
 
-    def init_database(self) -> None:
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+        self.__rebuild_start_lock = threading.Lock()
+        self.__rebuild_pid: Optional[int] = None
 
-            cur.execute("DROP TABLE IF EXISTS friends")
-            cur.execute(
-                """
-                CREATE TABLE friends (
-                    id SERIAL PRIMARY KEY,
-                    login TEXT NOT NULL,
-                    friendLogin TEXT NOT NULL,
-                    date TIMESTAMP WITH TIME ZONE NOT NULL
-                );
-                """
+    def get_user_friends(
+        self,
+        login: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieve one page of the user's friends, newest first.
+
+        Args:
+            login (str): The user's login.
+            limit (Optional[int]): The page size; None returns every remaining friend.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The friends and the cursor of
+            the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        query, params = self.__page_query(login, limit, offset, cursor)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(Friend.from_row))
+            cur.execute(query, params)
+            friends = cur.fetchall()
+
+        next_cursor = None
+        if limit is not None and len(friends) > limit:
+            friends = friends[:limit]
+            next_cursor = (
+                encode_cursor(friends[-1].addedAt, friends[-1].id) if friends else None
             )
 
-            conn.commit()
+        return [friend.friend for friend in friends], next_cursor
+
+    def get_user_friends_json(
+        self,
+        login: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Same as get_user_friends, but the JSON array is built by PostgreSQL.
+
+        Args:
+            login (str): The user's login.
+            limit (Optional[int]): The page size; None returns every remaining friend.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[str, Optional[str]]: The friends as a JSON array and the cursor of
+            the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        query, params = self.__page_query(login, limit, offset, cursor)
 
-    def get_user_friends(self, login: str) -> List[Dict[str, Any]]:
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
             cur.execute(
-                "SELECT friendLogin, date FROM friends WHERE login = %s ORDER BY date DESC",
-                (login,),
+                """
+                WITH page AS ({}), numbered AS (
+                    SELECT *, row_number() OVER (ORDER BY date DESC, id DESC) AS n
+                    FROM page
+                )
+                SELECT
+                    COALESCE(
+                        json_agg(
+                            json_build_object('addedAt', {}, 'login', friendLogin)
+                            ORDER BY n
+                        ) FILTER (WHERE %s::int IS NULL OR n <= %s),
+                        '[]'
+                    )::text,
+                    (array_agg(date) FILTER (WHERE n = %s))[1],
+                    (array_agg(id) FILTER (WHERE n = %s))[1],
+                    COUNT(*)
+                FROM numbered
+                """.format(
+                    query, _ADDED_AT_SQL
+                ),
+                params + [limit, limit, limit, limit],
             )
-            rows = cur.fetchall()
-            friends = [
-                {
-                    "login": row[0],
-                    "addedAt": row[1].strftime("%Y-%m-%dT%H:%M:%S")
-                    + "Z"
-                    + row[1].strftime("%z")[1:3]
-                    + ":"
-                    + row[1].strftime("%z")[3:],
-                }
-                for row in rows
-            ]
-            return friends
+            body, last_date, last_id, fetched = cur.fetchone()
+
+        next_cursor = None
+        if limit is not None and fetched > limit and last_id is not None:
+            next_cursor = encode_cursor(last_date, last_id)
+        return body, next_cursor
+
+    def stream_user_friends(
+        self,
+        login: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        chunk_size: int = 500,
+    ) -> Tuple[Iterator[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Same as get_user_friends, but the page is read lazily from a server-side cursor.
+
+        Args:
+            login (str): The user's login.
+            limit (Optional[int]): The page size; None returns every remaining friend.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+            chunk_size (int): The number of friends read per round trip.
+
+        Returns:
+            Tuple[Iterator[List[Dict[str, Any]]], Optional[str]]: The friends in
+            chunks and the cursor of the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        next_cursor = None
+        if limit is not None and limit > 0:
+            # The cursor goes out in a header, before the body, so find it first.
+            query, params = self.__page_query(
+                login, limit, offset, cursor, columns="date, id"
+            )
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(query, params)
+                keys = cur.fetchall()
+            if len(keys) > limit:
+                next_cursor = encode_cursor(*keys[limit - 1])
+
+        query, params = self.__page_query(login, limit, offset, cursor, lookahead=0)
+        chunks = (
+            [Friend.from_row(row).friend for row in rows]
+            for rows in self.pool.stream(query, params, chunk_size)
+        )
+        return chunks, next_cursor
+
+    def __page_query(
+        self,
+        login: str,
+        limit: Optional[int],
+        offset: int,
+        cursor: Optional[str],
+        columns: str = "id, friendLogin, date",
+        lookahead: int = 1,
+    ) -> Tuple[str, List[Any]]:
+        # By default one row past the page is fetched to tell whether a next page exists.
+        query = "SELECT {} FROM friends WHERE login = %s".format(columns)
+        params: List[Any] = [login]
+        if cursor is not None:
+            after_date, after_id = decode_cursor(cursor)
+            if not isinstance(after_id, int):
+                raise ValueError("Invalid cursor")
+            query += " AND (date, id) < (%s, %s)"
+            params += [after_date, after_id]
+        query += " ORDER BY date DESC, id DESC LIMIT %s OFFSET %s"
+        params += [None if limit is None else limit + lookahead, offset]
+        return query, params
 
     def add_friend(self, login: str, friendLogin: str) -> bool:
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
 
-            if self.is_friend_registered(login, friendLogin):
-                return True
-
+            # The timeline backfill joins the same transaction, so a friend is
+            # only added together with the author's posts in the timeline.
             try:
                 cur.execute(
-                    "INSERT INTO friends (login, friendLogin, date) VALUES (%s, %s, NOW())",
+                    """
+                    INSERT INTO friends (login, friendLogin, date) VALUES (%s, %s, NOW())
+                    ON CONFLICT (login, friendLogin) DO NOTHING
+                    """,
                     (login, friendLogin),
                 )
+                added = cur.rowcount == 1
+                if added and self.timeline_database is not None:
+                    self.timeline_database.follow(login, friendLogin)
             except:
+                conn.rollback()
                 return False
 
             conn.commit()
+
+        if added:
+            self.friendship_cache.invalidate(login)
+            if self.friend_graph is not None:
+                self.friend_graph.add(login, friendLogin)
         return True
 
     def remove_friend(self, login: str, friendLogin: str) -> bool:
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
 
             try:
@@ -73,13 +251,175 @@ class FriendsPostgreClient:
                     "DELETE FROM friends WHERE login = %s AND friendLogin = %s",
                     (login, friendLogin),
                 )
+                removed = cur.rowcount == 1
+                if removed and self.timeline_database is not None:
+                    self.timeline_database.unfollow(login, friendLogin)
             except:
+                conn.rollback()
                 return False
 
             conn.commit()
+
+        if removed:
+            self.friendship_cache.invalidate(login)
+            if self.friend_graph is not None:
+                self.friend_graph.remove(login, friendLogin)
         return True
 
-    def is_friend_registered(self, login: str, friend_login: str) -> bool:
-        friends = self.get_user_friends(login)
-        registered_logins = [friend["login"] for friend in friends]
-        return friend_login in registered_logins
+    def get_followers(self, login: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Retrieve the logins of the users who have added login as a friend.
+
+        Args:
+            login (str): The login to look for in other users' friend lists.
+            limit (Optional[int]): The maximum number of logins; None returns all.
+
+        Returns:
+            List[str]: The followers, in no particular order.
+        """
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT login FROM friends WHERE friendLogin = %s LIMIT %s",
+                (login, limit),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def is_friend(self, login: str, friend_login: str) -> bool:
+        """
+        Check whether login has added friend_login as a friend.
+
+        Args:
+            login (str): The login of the user who owns the friend list.
+            friend_login (str): The login to look for.
+
+        Returns:
+            bool: True if friend_login is in login's friend list.
+        """
+
+        if self.friendship_cache.max_size <= 0:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT EXISTS (SELECT 1 FROM friends WHERE login = %s AND friendLogin = %s)",
+                    (login, friend_login),
+                )
+                return cur.fetchone()[0]
+
+        friends = self.friendship_cache.get(login)
+        if friends is None:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT friendLogin FROM friends WHERE login = %s", (login,)
+                )
+                friends = frozenset(row[0] for row in cur.fetchall())
+            self.friendship_cache.put(login, friends)
+
+        return friend_login in friends
+
+    def warm_friend_graph(self) -> None:
+        """
+        Load the whole friends table into the friend graph.
+        """
+
+        if self.friend_graph is not None:
+            self.friend_graph.replace(self.__friend_edges())
+
+    def __friend_edges(self) -> Iterator[Tuple[str, str]]:
+        # A generator, so the table is read only once the graph is recording
+        # the changes made in the meantime. stream() keeps its connection off
+        # the thread, so nothing else joins this long-lived transaction.
+        for rows in self.pool.stream(
+            "SELECT login, friendLogin FROM friends", chunk_size=10000
+        ):
+            yield from rows
+
+    def __ensure_rebuilder(self) -> None:
+        # Started lazily so that a pre-forked server starts one per worker.
+        if self.__rebuild_pid == os.getpid() or not self.graph_rebuild_interval:
+            return
+        with self.__rebuild_start_lock:
+            if self.__rebuild_pid == os.getpid():
+                return
+            self.__rebuild_pid = os.getpid()
+            threading.Thread(
+                target=self.__rebuild_periodically, name="friend-graph", daemon=True
+            ).start()
+
+    def __rebuild_periodically(self) -> None:
+        while True:
+            time.sleep(self.graph_rebuild_interval)
+            try:
+                self.warm_friend_graph()
+            except:
+                logger.exception("Failed to rebuild the friend graph")
+
+    def suggest_friends(self, login: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Suggest public users the user's friends have added, by mutual friends.
+
+        Ranked in memory from the friend graph when there is one; the database
+        is then only asked which of the top candidates are public. Without a
+        graph the same ranking is computed by a query.
+
+        Args:
+            login (str): The user's login.
+            limit (int): The maximum number of suggestions.
+
+        Returns:
+            List[Dict[str, Any]]: {"login", "mutualFriends"} objects, most mutual
+            friends first, ties by login.
+        """
+
+        if self.friend_graph is None:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    """
+                    SELECT b.friendLogin, COUNT(*) FROM friends a
+                    JOIN friends b ON b.login = a.friendLogin
+                    JOIN users u ON u.login = b.friendLogin
+                    WHERE a.login = %(login)s AND b.friendLogin <> %(login)s
+                        AND u.isPublic
+                        AND NOT EXISTS (
+                            SELECT 1 FROM friends f
+                            WHERE f.login = %(login)s AND f.friendLogin = b.friendLogin
+                        )
+                    GROUP BY b.friendLogin
+                    ORDER BY COUNT(*) DESC, b.friendLogin COLLATE "C"
+                    LIMIT %(limit)s
+                    """,
+                    {"login": login, "limit": limit},
+                )
+                return [
+                    {"login": candidate, "mutualFriends": mutual}
+                    for candidate, mutual in cur.fetchall()
+                ]
+
+        self.__ensure_rebuilder()
+
+        # Private candidates are dropped after ranking; ask for more if too
+        # many of the first ones were private.
+        wanted = limit
+        while True:
+            ranked = self.friend_graph.suggest(login, wanted)
+            if not ranked:
+                return []
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT login FROM users WHERE login = ANY(%s) AND isPublic",
+                    ([candidate for candidate, _ in ranked],),
+                )
+                public = {row[0] for row in cur.fetchall()}
+
+            suggestions = [
+                {"login": candidate, "mutualFriends": mutual}
+                for candidate, mutual in ranked
+                if candidate in public
+            ]
+            if len(suggestions) >= limit or len(ranked) < wanted:
+                return suggestions[:limit]
+            wanted *= 4
@@ -0,0 +1,275 @@
+import argparse
+import os
+import sys
+from typing import List, Tuple
+from .connection_pool import PostgresConnectionPool
+
+
+# (version, description, SQL). Append new migrations; never edit applied ones.
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (
+        1,
+        "create base tables",
+        r"""
+        CREATE UNIQUE INDEX IF NOT EXISTS countries_alpha2_key ON countries (alpha2);
+
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            login TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            countryCode TEXT NOT NULL REFERENCES countries(alpha2),
+            isPublic BOOLEAN NOT NULL,
+            phone TEXT UNIQUE,
+            image TEXT,
+            CHECK (login ~ '^[a-zA-Z0-9-]{1,30}$'),
+            CHECK (LENGTH(email) <= 50),
+            CHECK (LENGTH(email) > 0),
+            CHECK (phone ~ '^\+[\d]+$'),
+            CHECK (LENGTH(image) <= 200)
+        );
+
+        CREATE TABLE IF NOT EXISTS friends (
+            id SERIAL PRIMARY KEY,
+            login TEXT NOT NULL,
+            friendLogin TEXT NOT NULL,
+            date TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS posts (
+            id TEXT PRIMARY KEY NOT NULL,
+            content TEXT NOT NULL,
+            author TEXT NOT NULL,
+            tags TEXT[] NOT NULL,
+            createdAt TIMESTAMP WITH TIME ZONE NOT NULL,
+            likesCount INTEGER DEFAULT 0,
+            dislikesCount INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS post_reactions (
+            post_id TEXT NOT NULL,
+            user_login TEXT NOT NULL,
+            reaction TEXT NOT NULL,
+            PRIMARY KEY (post_id, user_login)
+        );
+        """,
+    ),
+    (
+        2,
+        "add hot path indexes",
+        """
+        DELETE FROM friends a USING friends b
+        WHERE a.login = b.login AND a.friendLogin = b.friendLogin AND a.id > b.id;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS friends_login_friendlogin_key
+            ON friends (login, friendLogin);
+        CREATE INDEX IF NOT EXISTS friends_login_date_idx
+            ON friends (login, date DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS posts_author_createdat_idx
+            ON posts (author, createdAt DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS post_reactions_post_id_reaction_idx
+            ON post_reactions (post_id, reaction);
+        """,
+    ),
+    (
+        3,
+        "add row versions for conditional requests",
+        """
+        ALTER TABLE users
+            ADD COLUMN IF NOT EXISTS updatedAt TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+        ALTER TABLE posts
+            ADD COLUMN IF NOT EXISTS updatedAt TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+        UPDATE posts SET updatedAt = createdAt;
+        """,
+    ),
+    (
+        4,
+        "add home timelines",
+        """
+        CREATE TABLE IF NOT EXISTS timelines (
+            owner TEXT NOT NULL,
+            post_id TEXT NOT NULL,
+            author TEXT NOT NULL,
+            createdAt TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (owner, post_id)
+        );
+        CREATE INDEX IF NOT EXISTS timelines_owner_createdat_idx
+            ON timelines (owner, createdAt DESC, post_id DESC);
+
+        CREATE TABLE IF NOT EXISTS timeline_pull (
+            author TEXT PRIMARY KEY
+        );
+
+        CREATE INDEX IF NOT EXISTS friends_friendlogin_idx ON friends (friendLogin);
+
+        INSERT INTO timelines (owner, post_id, author, createdAt)
+        SELECT f.login, p.id, p.author, p.createdAt
+        FROM friends f JOIN posts p ON p.author = f.friendLogin
+        ON CONFLICT DO NOTHING;
+        """,
+    ),
+    (
+        5,
+        "add tag indexes",
+        """
+        CREATE INDEX IF NOT EXISTS posts_tags_idx ON posts USING GIN (tags);
+        CREATE INDEX IF NOT EXISTS posts_createdat_idx
+            ON posts (createdAt DESC, id DESC);
+        """,
+    ),
+    (
+        6,
+        "add full-text search over post content",
+        """
+        ALTER TABLE posts ADD COLUMN IF NOT EXISTS search tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;
+        CREATE INDEX IF NOT EXISTS posts_search_idx ON posts USING GIN (search);
+        """,
+    ),
+    (
+        7,
+        "add login autocomplete indexes",
+        """
+        CREATE INDEX IF NOT EXISTS users_updatedat_idx ON users (updatedAt);
+
+        -- pg_trgm ships with the contrib package and is a trusted extension, so
+        -- the database owner can usually create it. Without it, a btree index
+        -- still serves the prefix searches.
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            CREATE INDEX IF NOT EXISTS users_login_trgm_idx
+                ON users USING GIN (lower(login) gin_trgm_ops) WHERE isPublic;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE NOTICE 'pg_trgm is not available (%), using a btree index', SQLERRM;
+            CREATE INDEX IF NOT EXISTS users_login_prefix_idx
+                ON users (lower(login) text_pattern_ops) WHERE isPublic;
+        END
+        $$;
+        """,
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent starts migrate once.
+_LOCK_KEY = 2024_0001
+
+
+class SchemaVersionError(Exception):
+    """
+    Raised at startup when the database schema is older than the code expects.
+    """
+
+
+class SchemaMigrator:
+    """
+    Applies MIGRATIONS in order and records them in the schema_migrations table.
+    """
+
+    def __init__(self, pool: PostgresConnectionPool) -> None:
+        """
+        Initialize the SchemaMigrator with a PostgreSQL connection pool.
+
+        Args:
+            pool (PostgresConnectionPool): The shared connection pool.
+        """
+
+        self.pool = pool
+
+    def current_version(self) -> int:
+        """
+        Read the schema version recorded in the database.
+
+        Returns:
+            int: The highest applied migration, or 0 for an empty database.
+        """
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT to_regclass('schema_migrations')")
+            if cur.fetchone()[0] is None:
+                return 0
+
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            return cur.fetchone()[0]
+
+    def migrate(self) -> List[int]:
+        """
+        Apply every pending migration in a single transaction.
+
+        Safe to run repeatedly and from several processes at once.
+
+        Returns:
+            List[int]: The versions applied by this call.
+        """
+
+        applied = []
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            current = cur.fetchone()[0]
+
+            for version, description, sql in MIGRATIONS:
+                if version <= current:
+                    continue
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description),
+                )
+                applied.append(version)
+
+        return applied
+
+    def check(self) -> None:
+        """
+        Verify that every migration has been applied.
+
+        Raises:
+            SchemaVersionError: If the database schema is behind LATEST_VERSION.
+        """
+
+        version = self.current_version()
+        if version < LATEST_VERSION:
+            raise SchemaVersionError(
+                "Database schema is at version {}, expected {}; run migrations with --migrate".format(
+                    version, LATEST_VERSION
+                )
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the database schema.")
+    parser.add_argument(
+        "--migrate", action="store_true", help="apply pending migrations"
+    )
+    args = parser.parse_args()
+
+    pool = PostgresConnectionPool(os.environ.get("POSTGRES_CONN"), min_size=0)
+    migrator = SchemaMigrator(pool)
+
+    if args.migrate:
+        applied = migrator.migrate()
+        print("Applied migrations: {}".format(applied or "none"))
+    else:
+        version = migrator.current_version()
+        print("Schema version {} of {}".format(version, LATEST_VERSION))
+        if version < LATEST_VERSION:
+            sys.exit(1)
+
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
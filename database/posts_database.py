@@ -1,35 +1,54 @@
-import psycopg2
-from typing import Any, Optional, Dict
-from ..modules.post import Post
+from typing import Any, Iterator, Optional, Dict, List, Tuple
+from .connection_pool import PostgresConnectionPool
+from .row_factory import model_cursor
+from .friend_database import FriendsPostgreClient
+from .timeline_database import TimelinePostgreClient
+from ..modules.post import Post, POST_COLUMNS
+from ..modules.pagination import (
+    encode_cursor,
+    decode_cursor,
+    encode_rank_cursor,
+    decode_rank_cursor,
+)
+from ..modules.metrics import instrumented
 import uuid
 import datetime
+import re
 
+# Words of a search beyond this are ignored.
+SEARCH_MAX_WORDS = 10
 
-class PostPostgreClient:
-    def __init__(self, ps_conn: str) -> None:
-        self.ps_conn = ps_conn
-        self.init_database()
+# A post is visible to %(viewer)s if its author is public, has added the viewer
+# as a friend, or is the viewer.
+_VISIBLE_TO_VIEWER = """
+    (author = %(viewer)s OR EXISTS (
+        SELECT 1 FROM users u WHERE u.login = posts.author AND (
+            u.isPublic OR EXISTS (
+                SELECT 1 FROM friends b
+                WHERE b.login = u.login AND b.friendLogin = %(viewer)s
+            )
+        )
+    ))
+"""
 
-    def init_database(self) -> None:
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+# Renders createdAt in the HTTP date format jsonify uses for datetimes.
+_CREATED_AT_SQL = """
+    to_char(createdAt AT TIME ZONE 'UTC', 'Dy, DD Mon YYYY HH24:MI:SS "GMT"')
+"""
 
-            cur.execute("DROP TABLE IF EXISTS posts")
-            cur.execute(
-                """
-                CREATE TABLE posts (
-                    id TEXT PRIMARY KEY NOT NULL,
-                    content TEXT NOT NULL,
-                    author TEXT NOT NULL,
-                    tags TEXT[] NOT NULL,
-                    createdAt TIMESTAMP WITH TIME ZONE NOT NULL,
-                    likesCount INTEGER DEFAULT 0,
-                    dislikesCount INTEGER DEFAULT 0 
-                );
-                """
-            )
 
-            conn.commit()
+@instrumented
+class PostPostgreClient:
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        friend_database: Optional[FriendsPostgreClient] = None,
+        timeline_database: Optional[TimelinePostgreClient] = None,
+    ) -> None:
+        self.pool = pool
+        # New posts are pushed into followers' home timelines when both are provided.
+        self.friend_database = friend_database
+        self.timeline_database = timeline_database
 
     def add_post(self, login: str, post_data: Dict[str, Any]) -> Optional[Post]:
 
@@ -38,7 +57,7 @@ class PostPostgreClient:
         post_data["createdAt"] = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
         post_data["author"] = login
 
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
 
             try:
@@ -46,7 +65,8 @@ class PostPostgreClient:
                 cur.execute(
                     """
                     INSERT INTO posts (id, content, author, tags, createdAt)
-                    VALUES (%s, %s, %s, %s, NOW());
+                    VALUES (%s, %s, %s, %s, NOW())
+                    RETURNING createdAt;
                     """,
                     (
                         post.id,
@@ -55,39 +75,39 @@ class PostPostgreClient:
                         post.tags,
                     ),
                 )
+                created_at = cur.fetchone()[0]
 
                 conn.commit()
             except:
                 return None
 
+        if self.friend_database is not None and self.timeline_database is not None:
+            followers = self.friend_database.get_followers(
+                login, limit=self.timeline_database.fanout_limit + 1
+            )
+            self.timeline_database.publish(post.id, login, created_at, followers)
+
         return post
 
     def get_post_by_id(self, post_id: str) -> Optional[Post]:
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(Post.from_row))
 
             cur.execute(
-                """
-                SELECT * FROM posts WHERE id = %s;
-                """,
+                "SELECT {} FROM posts WHERE id = %s;".format(POST_COLUMNS),
                 (post_id,),
             )
 
-            post = cur.fetchone()
-
-            if post:
-                return Post(*post)
-            else:
-                return None
+            return cur.fetchone()
 
     def update_post(self, post_id: str, update_data: Dict[str, Any]) -> None:
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
 
             cur.execute(
                 """
                 UPDATE posts
-                SET likesCount = %s, dislikesCount = %s
+                SET likesCount = %s, dislikesCount = %s, updatedAt = NOW()
                 WHERE id = %s;
                 """,
                 (
@@ -100,7 +120,7 @@ class PostPostgreClient:
             conn.commit()
 
     def delete_post(self, post_id: str) -> None:
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
 
             cur.execute(
@@ -112,20 +132,336 @@ class PostPostgreClient:
 
             conn.commit()
 
-    def get_posts_by_user(self, login: str) -> list:
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+    def get_posts_by_user(
+        self,
+        login: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieve one page of the user's posts, newest first.
+
+        Args:
+            login (str): The author's login.
+            limit (Optional[int]): The page size; None returns every remaining post.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The posts and the cursor of
+            the next page, or None if this is the last page.
 
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        query, params = self.__page_query(login, limit, offset, cursor)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(Post.from_row))
+            cur.execute(query, params)
+            posts = cur.fetchall()
+
+        next_cursor = None
+        if limit is not None and len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = (
+                encode_cursor(posts[-1].createdAt, posts[-1].id) if posts else None
+            )
+
+        return [post.post for post in posts], next_cursor
+
+    def get_posts_by_user_json(
+        self,
+        login: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Same as get_posts_by_user, but the JSON array is built by PostgreSQL.
+
+        Args:
+            login (str): The author's login.
+            limit (Optional[int]): The page size; None returns every remaining post.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[str, Optional[str]]: The posts as a JSON array and the cursor of
+            the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        query, params = self.__page_query(login, limit, offset, cursor)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
             cur.execute(
                 """
-                SELECT * FROM posts WHERE author = %s ORDER BY createdAt DESC;
-                """,
-                (login,),
+                WITH page AS ({}), numbered AS (
+                    SELECT *, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS n
+                    FROM page
+                )
+                SELECT
+                    COALESCE(
+                        json_agg(
+                            json_build_object(
+                                'author', author,
+                                'content', content,
+                                'createdAt', {},
+                                'dislikesCount', dislikesCount,
+                                'id', id,
+                                'likesCount', likesCount,
+                                'tags', tags
+                            )
+                            ORDER BY n
+                        ) FILTER (WHERE %s::int IS NULL OR n <= %s),
+                        '[]'
+                    )::text,
+                    (array_agg(createdAt) FILTER (WHERE n = %s))[1],
+                    (array_agg(id) FILTER (WHERE n = %s))[1],
+                    COUNT(*)
+                FROM numbered
+                """.format(
+                    query, _CREATED_AT_SQL
+                ),
+                params + [limit, limit, limit, limit],
             )
+            body, last_created_at, last_id, fetched = cur.fetchone()
+
+        next_cursor = None
+        if limit is not None and fetched > limit and last_id is not None:
+            next_cursor = encode_cursor(last_created_at, last_id)
+        return body, next_cursor
+
+    def stream_posts_by_user(
+        self,
+        login: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        chunk_size: int = 500,
+    ) -> Tuple[Iterator[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Same as get_posts_by_user, but the page is read lazily from a server-side cursor.
 
+        Args:
+            login (str): The author's login.
+            limit (Optional[int]): The page size; None returns every remaining post.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+            chunk_size (int): The number of posts read per round trip.
+
+        Returns:
+            Tuple[Iterator[List[Dict[str, Any]]], Optional[str]]: The posts in
+            chunks and the cursor of the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        next_cursor = None
+        if limit is not None and limit > 0:
+            # The cursor goes out in a header, before the body, so find it first.
+            query, params = self.__page_query(
+                login, limit, offset, cursor, columns="createdAt, id"
+            )
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(query, params)
+                keys = cur.fetchall()
+            if len(keys) > limit:
+                next_cursor = encode_cursor(*keys[limit - 1])
+
+        query, params = self.__page_query(login, limit, offset, cursor, lookahead=0)
+        chunks = (
+            [Post.from_row(row).post for row in rows]
+            for rows in self.pool.stream(query, params, chunk_size)
+        )
+        return chunks, next_cursor
+
+    def get_posts_by_tags(
+        self,
+        tags: List[str],
+        viewer: str,
+        match_all: bool = False,
+        limit: int = 5,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieve one page of the posts with the given tags that viewer may see, newest first.
+
+        A post is visible if its author is public, has added viewer as a friend,
+        or is viewer; the check runs in the query, so hidden posts never count
+        against the page size.
+
+        Args:
+            tags (List[str]): The tags to look for.
+            viewer (str): The login of the user asking.
+            match_all (bool): Require every tag instead of any of them.
+            limit (int): The page size.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The posts and the cursor of
+            the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        # && and @> are answered by the GIN index on tags.
+        query = "SELECT {} FROM posts WHERE tags {} %(tags)s::text[] AND {}".format(
+            POST_COLUMNS, "@>" if match_all else "&&", _VISIBLE_TO_VIEWER
+        )
+        params: Dict[str, Any] = {"tags": tags, "viewer": viewer}
+        if cursor is not None:
+            after_created_at, after_id = decode_cursor(cursor)
+            if not isinstance(after_id, str):
+                raise ValueError("Invalid cursor")
+            query += " AND (createdAt, id) < (%(after_created_at)s, %(after_id)s)"
+            params.update(after_created_at=after_created_at, after_id=after_id)
+        query += " ORDER BY createdAt DESC, id DESC LIMIT %(limit)s OFFSET %(offset)s"
+        params.update(limit=limit + 1, offset=offset)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(Post.from_row))
+            cur.execute(query, params)
             posts = cur.fetchall()
 
-        result = []
-        for post in posts:
-            result.append(Post(*post).post)
-        return result
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = (
+                encode_cursor(posts[-1].createdAt, posts[-1].id) if posts else None
+            )
+
+        return [post.post for post in posts], next_cursor
+
+    def search_posts(
+        self,
+        text: str,
+        viewer: str,
+        limit: int = 5,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieve one page of the posts matching a search that viewer may see, best first.
+
+        Every word of the search must start a word of the content. Posts are
+        ranked by ts_rank_cd over the indexed search column; visibility is
+        checked in the same query.
+
+        Args:
+            text (str): The search text.
+            viewer (str): The login of the user asking.
+            limit (int): The page size.
+            offset (int): The number of rows to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The posts and the cursor of
+            the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the search has no words or the cursor is malformed.
+        """
+
+        words = re.findall(r"\w+", text.lower())[:SEARCH_MAX_WORDS]
+        if not words:
+            raise ValueError("Empty search")
+        # Only word characters reach to_tsquery, so the text cannot inject operators.
+        tsquery = " & ".join(word + ":*" for word in words)
+
+        query = """
+            SELECT * FROM (
+                SELECT {}, ts_rank_cd(search, query) AS rank
+                FROM posts, to_tsquery('simple', %(tsquery)s) AS query
+                WHERE search @@ query AND {}
+            ) ranked
+        """.format(
+            POST_COLUMNS, _VISIBLE_TO_VIEWER
+        )
+        params: Dict[str, Any] = {"tsquery": tsquery, "viewer": viewer}
+        if cursor is not None:
+            after_rank, after_id = decode_rank_cursor(cursor)
+            if not isinstance(after_id, str):
+                raise ValueError("Invalid cursor")
+            query += " WHERE (rank, id) < (%(after_rank)s::real, %(after_id)s)"
+            params.update(after_rank=after_rank, after_id=after_id)
+        query += " ORDER BY rank DESC, id DESC LIMIT %(limit)s OFFSET %(offset)s"
+        params.update(limit=limit + 1, offset=offset)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, params)
+            rows = cur.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (
+                encode_rank_cursor(rows[-1][-1], rows[-1][0]) if rows else None
+            )
+
+        return [Post.from_row(row[:-1]).post for row in rows], next_cursor
+
+    def count_recent_tags(
+        self, window: float, bucket: float
+    ) -> List[Tuple[str, int, int]]:
+        """
+        Count the tags of public users' posts created within the window, per time bucket.
+
+        Args:
+            window (float): How far back to look, in seconds.
+            bucket (float): The bucket width in seconds.
+
+        Returns:
+            List[Tuple[str, int, int]]: (tag, bucket number, posts) rows, where the
+            bucket number is the Unix time of createdAt divided by bucket.
+        """
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT tag, floor(extract(epoch FROM p.createdAt) / %(bucket)s)::bigint,
+                    count(DISTINCT p.id)
+                FROM posts p
+                JOIN users u ON u.login = p.author AND u.isPublic
+                CROSS JOIN LATERAL unnest(p.tags) AS tag
+                WHERE p.createdAt > NOW() - %(window)s * interval '1 second'
+                GROUP BY 1, 2
+                """,
+                {"window": window, "bucket": bucket},
+            )
+            return cur.fetchall()
+
+    def __page_query(
+        self,
+        login: str,
+        limit: Optional[int],
+        offset: int,
+        cursor: Optional[str],
+        columns: str = POST_COLUMNS,
+        lookahead: int = 1,
+    ) -> Tuple[str, List[Any]]:
+        # By default one row past the page is fetched to tell whether a next page exists.
+        query = "SELECT {} FROM posts WHERE author = %s".format(columns)
+        params: List[Any] = [login]
+        if cursor is not None:
+            after_created_at, after_id = decode_cursor(cursor)
+            if not isinstance(after_id, str):
+                raise ValueError("Invalid cursor")
+            query += " AND (createdAt, id) < (%s, %s)"
+            params += [after_created_at, after_id]
+        query += " ORDER BY createdAt DESC, id DESC LIMIT %s OFFSET %s"
+        params += [None if limit is None else limit + lookahead, offset]
+        return query, params
@@ -0,0 +1,288 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from psycopg2.extras import execute_values
+from .connection_pool import PostgresConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# post_id -> user_login -> (reaction, reaction stored when it was buffered)
+_Pending = Dict[str, Dict[str, Tuple[str, Optional[str]]]]
+
+
+class ReactionBufferFullError(Exception):
+    """
+    Raised when the buffer is full and flushing it to the database failed.
+    """
+
+
+class _Shard:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending: _Pending = {}
+        self.size = 0
+
+
+def _delta(reaction: str, stored: Optional[str]) -> Tuple[int, int]:
+    likes = (reaction == "like") - (stored == "like")
+    dislikes = (reaction == "dislike") - (stored == "dislike")
+    return likes, dislikes
+
+
+class ReactionBuffer:
+    """
+    An in-memory, sharded write-behind buffer for post reactions.
+
+    Reactions are acknowledged as soon as they are buffered and written to
+    post_reactions and the post counters in one batched transaction when the
+    buffer reaches max_pending entries or every flush_interval seconds.
+    """
+
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        shards: int = 16,
+        max_pending: int = 1000,
+        flush_interval: float = 0.2,
+    ) -> None:
+        """
+        Initialize an empty buffer; the flush thread starts with the first reaction.
+
+        Args:
+            pool (PostgresConnectionPool): The shared connection pool.
+            shards (int): The number of independently locked partitions.
+            max_pending (int): The number of buffered reactions that triggers a flush.
+            flush_interval (float): The maximum number of seconds a reaction stays buffered.
+        """
+
+        self.pool = pool
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+
+        self.__shards = [_Shard() for _ in range(shards)]
+        self.__inflight: _Pending = {}
+        self.__inflight_lock = threading.Lock()
+        self.__flush_lock = threading.Lock()
+        self.__start_lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__closed = False
+        self.__thread_pid: Optional[int] = None
+
+    def __shard(self, post_id: str) -> _Shard:
+        return self.__shards[hash(post_id) % len(self.__shards)]
+
+    def __ensure_flusher(self) -> None:
+        # Started lazily so that a pre-forked server starts one per worker.
+        if self.__thread_pid == os.getpid():
+            return
+        with self.__start_lock:
+            if self.__thread_pid == os.getpid():
+                return
+            self.__thread_pid = os.getpid()
+            threading.Thread(
+                target=self.__run, name="reaction-buffer", daemon=True
+            ).start()
+
+    def __run(self) -> None:
+        while not self.__closed:
+            self.__wake.wait(self.flush_interval)
+            self.__wake.clear()
+            try:
+                self.flush()
+            except:
+                logger.exception("Failed to flush buffered reactions")
+
+    def add(
+        self, post_id: str, user_login: str, reaction: str, stored: Optional[str]
+    ) -> None:
+        """
+        Buffer a reaction, replacing any earlier buffered reaction of the same user.
+
+        Args:
+            post_id (str): The id of the post.
+            user_login (str): The login of the reacting user.
+            reaction (str): Either "like" or "dislike".
+            stored (Optional[str]): The user's reaction in the database when the
+                post was read for this request. Only pending_delta uses it; the
+                flush looks the stored reaction up again in the batched upsert.
+
+        Raises:
+            ReactionBufferFullError: If the buffer is full and cannot be flushed.
+        """
+
+        self.__ensure_flusher()
+        shard = self.__shard(post_id)
+
+        if self.size() >= 2 * self.max_pending:
+            # The flush thread is falling behind; apply backpressure. A failed
+            # flush puts its batch back, and this reaction is not buffered.
+            try:
+                self.flush()
+            except:
+                logger.exception("Failed to flush a full reaction buffer")
+                raise ReactionBufferFullError("Reaction buffer is full")
+
+        # A reaction of the same user that is being flushed will be stored by
+        # the time this one is.
+        with self.__inflight_lock:
+            inflight = self.__inflight.get(post_id, {}).get(user_login)
+        if inflight is not None:
+            stored = inflight[0]
+
+        with shard.lock:
+            entries = shard.pending.setdefault(post_id, {})
+            previous = entries.get(user_login)
+            if previous is None:
+                shard.size += 1
+            else:
+                stored = previous[1]  # the earlier one was not written either
+            entries[user_login] = (reaction, stored)
+
+        if self.size() >= self.max_pending:
+            self.__wake.set()
+
+    def size(self) -> int:
+        """
+        Count the buffered reactions that are not being flushed yet.
+
+        Returns:
+            int: The number of buffered reactions.
+        """
+
+        return sum(shard.size for shard in self.__shards)
+
+    def pending_delta(self, post_id: str) -> Tuple[int, int]:
+        """
+        Sum the counter changes of reactions not yet committed for a post.
+
+        Each user counts once, with their latest buffered reaction against the
+        reaction stored when it was buffered. While a flush is committing, the
+        result may be off by the reactions in that batch for a moment.
+
+        Args:
+            post_id (str): The id of the post.
+
+        Returns:
+            Tuple[int, int]: The likes and dislikes deltas.
+        """
+
+        shard = self.__shard(post_id)
+        with self.__inflight_lock:
+            entries = dict(self.__inflight.get(post_id, {}))
+        with shard.lock:
+            entries.update(shard.pending.get(post_id, {}))  # pending wins
+
+        likes, dislikes = 0, 0
+        for reaction, stored in entries.values():
+            like_delta, dislike_delta = _delta(reaction, stored)
+            likes += like_delta
+            dislikes += dislike_delta
+        return likes, dislikes
+
+    def flush(self) -> None:
+        """
+        Write every buffered reaction to the database in one transaction.
+        """
+
+        with self.__flush_lock:
+            batch: _Pending = {}
+            for shard in self.__shards:
+                with shard.lock:
+                    pending, shard.pending = shard.pending, {}
+                    shard.size = 0
+                batch.update(pending)
+
+            if not batch:
+                return
+
+            with self.__inflight_lock:
+                self.__inflight = batch
+
+            try:
+                self.__write(batch)
+            except:
+                self.__restore(batch)
+                raise
+            finally:
+                with self.__inflight_lock:
+                    self.__inflight = {}
+
+    def __write(self, batch: _Pending) -> None:
+        rows: List[Tuple[str, str, str]] = [
+            (post_id, user_login, reaction)
+            for post_id, entries in batch.items()
+            for user_login, (reaction, _) in entries.items()
+        ]
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id FROM posts WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+                (sorted(batch),),
+            )
+            execute_values(
+                cur,
+                """
+                WITH incoming (post_id, user_login, reaction) AS (VALUES %s),
+                previous AS (
+                    SELECT r.post_id, r.user_login, r.reaction
+                    FROM post_reactions r
+                    JOIN incoming i
+                        ON i.post_id = r.post_id AND i.user_login = r.user_login
+                ), upsert AS (
+                    INSERT INTO post_reactions (post_id, user_login, reaction)
+                    SELECT i.post_id, i.user_login, i.reaction
+                    FROM incoming i
+                    JOIN posts p ON p.id = i.post_id
+                    ON CONFLICT (post_id, user_login)
+                    DO UPDATE SET reaction = EXCLUDED.reaction
+                ), deltas AS (
+                    SELECT
+                        i.post_id,
+                        SUM(
+                            (i.reaction = 'like')::int
+                            - COALESCE((p.reaction = 'like')::int, 0)
+                        ) AS likes,
+                        SUM(
+                            (i.reaction = 'dislike')::int
+                            - COALESCE((p.reaction = 'dislike')::int, 0)
+                        ) AS dislikes
+                    FROM incoming i
+                    LEFT JOIN previous p
+                        ON p.post_id = i.post_id AND p.user_login = i.user_login
+                    GROUP BY i.post_id
+                )
+                UPDATE posts
+                SET likesCount = likesCount + deltas.likes,
+                    dislikesCount = dislikesCount + deltas.dislikes,
+                    updatedAt = NOW()
+                FROM deltas
+                WHERE posts.id = deltas.post_id;
+                """,
+                rows,
+                page_size=len(rows),
+            )
+
+    def __restore(self, batch: _Pending) -> None:
+        # Put a failed batch back; entries buffered since keep their newer reaction.
+        for post_id, entries in batch.items():
+            shard = self.__shard(post_id)
+            with shard.lock:
+                current = shard.pending.setdefault(post_id, {})
+                for user_login, entry in entries.items():
+                    if user_login not in current:
+                        current[user_login] = entry
+                        shard.size += 1
+                    else:
+                        # The newer reaction replaces one that was not stored.
+                        current[user_login] = (current[user_login][0], entry[1])
+
+    def close(self) -> None:
+        """
+        Stop the flush thread and write out everything still buffered.
+        """
+
+        self.__closed = True
+        self.__wake.set()
+        self.flush()
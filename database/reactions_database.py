@@ -1,95 +1,193 @@
-import psycopg2
-from psycopg2.extras import DictCursor
-from typing import Dict
+from typing import Dict, Optional, Tuple
+from .connection_pool import PostgresConnectionPool
+from .reaction_buffer import ReactionBuffer
+from .posts_database import POST_COLUMNS
+from .row_factory import model_cursor
+from ..modules.post import Post
+from ..modules.metrics import instrumented
 
 
+@instrumented
 class ReactionPostgreClient:
-    def __init__(self, ps_conn: str) -> None:
-        self.ps_conn = ps_conn
-        self.init_database()
+    def __init__(
+        self, pool: PostgresConnectionPool, buffer: Optional[ReactionBuffer] = None
+    ) -> None:
+        self.pool = pool
+        self.buffer = buffer  # write-behind ingestion when set
 
-    def init_database(self) -> None:
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+    def get_post_for_reaction(
+        self, post_id: str, user_login: str
+    ) -> Tuple[Optional[Post], Optional[str]]:
+        """
+        Read a post together with the user's stored reaction to it.
 
-            cur.execute("DROP TABLE IF EXISTS post_reactions")
-            cur.execute(
-                """
-                CREATE TABLE post_reactions (
-                    post_id TEXT NOT NULL,
-                    user_login TEXT NOT NULL,
-                    reaction TEXT NOT NULL,
-                    PRIMARY KEY (post_id, user_login)
-                );
-                """
-            )
+        Args:
+            post_id (str): The id of the post.
+            user_login (str): The login of the reacting user.
 
-            conn.commit()
+        Returns:
+            Tuple[Optional[Post], Optional[str]]: The post, or None if it does not
+            exist, and the user's stored reaction, or None if there is none.
+        """
 
-    def add_reaction(self, post_id: str, user_login: str, reaction: str) -> None:
-        with psycopg2.connect(self.ps_conn) as conn:
+        with self.pool.connection() as conn:
             cur = conn.cursor()
-            # Проверяем, существует ли уже реакция пользователя на этот пост
             cur.execute(
                 """
-                SELECT * FROM post_reactions 
-                WHERE post_id = %s AND user_login = %s;
-                """,
-                (post_id, user_login),
+                SELECT {}, r.reaction
+                FROM posts
+                LEFT JOIN post_reactions r
+                    ON r.post_id = posts.id AND r.user_login = %s
+                WHERE posts.id = %s;
+                """.format(
+                    POST_COLUMNS
+                ),
+                (user_login, post_id),
             )
-            existing_reaction = cur.fetchone()
-            if existing_reaction:
-                # Если реакция уже существует, обновляем ее значение
-                cur.execute(
-                    """
-                    UPDATE post_reactions 
-                    SET reaction = %s 
-                    WHERE post_id = %s AND user_login = %s;
-                    """,
-                    (reaction, post_id, user_login),
-                )
-            else:
-                # Иначе добавляем новую реакцию
-                cur.execute(
-                    """
-                    INSERT INTO post_reactions (post_id, user_login, reaction) 
-                    VALUES (%s, %s, %s);
-                    """,
-                    (post_id, user_login, reaction),
-                )
+            row = cur.fetchone()
+            if row is None:
+                return None, None
+            return Post.from_row(row[:-1]), row[-1]
 
-                cur.execute(
-                    """
-                    SELECT * FROM post_reactions 
-                    """,
-                )
-                existing_reaction = cur.fetchall()
+    def react(
+        self,
+        post: Post,
+        user_login: str,
+        reaction: str,
+        stored: Optional[str] = None,
+    ) -> Optional[Post]:
+        """
+        Store the user's reaction and return the post with updated counters.
 
-            conn.commit()
+        With a buffer the reaction is acknowledged from memory and written later;
+        otherwise it is applied immediately in one round trip.
 
-    def get_reaction_counts(self, post_id: str) -> Dict[str, int]:
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor(cursor_factory=DictCursor)
-            # Сначала получаем суммарное количество лайков
+        Args:
+            post (Post): The post being reacted to.
+            user_login (str): The login of the reacting user.
+            reaction (str): Either "like" or "dislike".
+            stored (Optional[str]): The user's reaction stored when the post was
+                read, as returned by get_post_for_reaction.
+
+        Returns:
+            Optional[Post]: The updated post, or None if it no longer exists.
+
+        Raises:
+            ReactionBufferFullError: If the buffer is full and cannot be flushed.
+        """
+
+        if self.buffer is not None:
+            self.buffer.add(post.id, user_login, reaction, stored)
+            return self.apply_pending(post)
+
+        return self.__react_now(post.id, user_login, reaction)
+
+    def apply_pending(self, post: Post) -> Post:
+        """
+        Add the counter changes of still-buffered reactions to a post read from the database.
+
+        While a flush is committing, the result may be off by the reactions in
+        that batch for a moment; the stored counters themselves are always exact.
+
+        Args:
+            post (Post): The post as stored in the database.
+
+        Returns:
+            Post: The post as the reacting users expect to see it.
+        """
+
+        if self.buffer is None:
+            return post
+
+        likes, dislikes = self.buffer.pending_delta(post.id)
+        if not likes and not dislikes:
+            return post
+
+        return Post(
+            post.id,
+            post.content,
+            post.author,
+            post.tags,
+            post.createdAt,
+            post.likesCount + likes,
+            post.dislikesCount + dislikes,
+            post.updatedAt,
+        )
+
+    def close(self) -> None:
+        """
+        Flush buffered reactions; called on shutdown.
+        """
+
+        if self.buffer is not None:
+            self.buffer.close()
+
+    def __react_now(
+        self, post_id: str, user_login: str, reaction: str
+    ) -> Optional[Post]:
+        # The post row is locked first, so concurrent reactions to the same post
+        # (including repeated clicks by the same user) apply their deltas one
+        # after another instead of recounting post_reactions.
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(Post.from_row))
             cur.execute(
                 """
-                SELECT COALESCE(SUM(CASE WHEN reaction = 'like' THEN 1 ELSE 0 END), 0) as likes_count
-                FROM post_reactions 
-                WHERE post_id = %s;
-                """,
-                (post_id,),
+                SELECT 1 FROM posts WHERE id = %(post_id)s FOR UPDATE;
+
+                WITH previous AS (
+                    SELECT reaction FROM post_reactions
+                    WHERE post_id = %(post_id)s AND user_login = %(user_login)s
+                ), upsert AS (
+                    INSERT INTO post_reactions (post_id, user_login, reaction)
+                    SELECT %(post_id)s, %(user_login)s, %(reaction)s
+                    WHERE EXISTS (SELECT 1 FROM posts WHERE id = %(post_id)s)
+                    ON CONFLICT (post_id, user_login)
+                    DO UPDATE SET reaction = EXCLUDED.reaction
+                )
+                UPDATE posts
+                SET likesCount = likesCount
+                        + (CASE WHEN %(reaction)s = 'like' THEN 1 ELSE 0 END)
+                        - (CASE WHEN (SELECT reaction FROM previous) = 'like' THEN 1 ELSE 0 END),
+                    dislikesCount = dislikesCount
+                        + (CASE WHEN %(reaction)s = 'dislike' THEN 1 ELSE 0 END)
+                        - (CASE WHEN (SELECT reaction FROM previous) = 'dislike' THEN 1 ELSE 0 END),
+                    updatedAt = NOW()
+                WHERE id = %(post_id)s
+                RETURNING {};
+                """.format(
+                    POST_COLUMNS
+                ),
+                {"post_id": post_id, "user_login": user_login, "reaction": reaction},
             )
-            likesCount = cur.fetchone()["likes_count"]
+            return cur.fetchone()
+
+    def get_reaction_counts(self, post_id: str) -> Dict[str, int]:
+        """
+        Count the reactions of a post from post_reactions.
 
-            # Затем получаем суммарное количество дизлайков
+        The counters on posts are maintained incrementally by react; this is only
+        needed to verify or repair them.
+
+        Args:
+            post_id (str): The id of the post.
+
+        Returns:
+            Dict[str, int]: The likesCount and dislikesCount of the post.
+        """
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
             cur.execute(
                 """
-                SELECT COALESCE(SUM(CASE WHEN reaction = 'dislike' THEN 1 ELSE 0 END), 0) as dislikes_count
-                FROM post_reactions 
+                SELECT
+                    COUNT(*) FILTER (WHERE reaction = 'like'),
+                    COUNT(*) FILTER (WHERE reaction = 'dislike')
+                FROM post_reactions
                 WHERE post_id = %s;
                 """,
                 (post_id,),
             )
-            dislikesCount = cur.fetchone()["dislikes_count"]
+            likesCount, dislikesCount = cur.fetchone()
 
             return {"likesCount": likesCount, "dislikesCount": dislikesCount}
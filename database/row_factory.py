@@ -0,0 +1,46 @@
+import functools
+from typing import Any, Callable, List, Optional, Sequence
+from .traced_cursor import TracedCursor
+
+RowModel = Callable[[Sequence[Any]], Any]
+
+
+class ModelCursor(TracedCursor):
+    """
+    A TracedCursor that builds an object from every fetched row.
+
+    Use model_cursor to get the subclass for a given model.
+    """
+
+    row_model: RowModel = tuple
+
+    def fetchone(self) -> Any:
+        row = super().fetchone()
+        return None if row is None else self.row_model(row)
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Any]:
+        return [self.row_model(row) for row in super().fetchmany(size)]
+
+    def fetchall(self) -> List[Any]:
+        return [self.row_model(row) for row in super().fetchall()]
+
+    def __next__(self) -> Any:
+        return self.row_model(super().__next__())
+
+
+@functools.lru_cache(maxsize=None)
+def model_cursor(row_model: RowModel) -> type:
+    """
+    Get the cursor class turning rows into objects with the given function.
+
+    Pass the result as cursor_factory, e.g. conn.cursor(cursor_factory=model_cursor(Post.from_row)).
+
+    Args:
+        row_model (RowModel): Builds an object from a row, e.g. Post.from_row.
+
+    Returns:
+        type: A ModelCursor subclass.
+    """
+
+    name = getattr(row_model, "__qualname__", "Model").replace(".", "") + "Cursor"
+    return type(name, (ModelCursor,), {"row_model": staticmethod(row_model)})
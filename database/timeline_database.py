@@ -0,0 +1,231 @@
+import datetime
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from .connection_pool import PostgresConnectionPool
+from .row_factory import model_cursor
+from ..modules.post import Post, POST_COLUMNS
+from ..modules.pagination import encode_cursor, decode_cursor
+from ..modules.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# A timeline post is visible to its owner if the author is public or has added
+# the owner as a friend, the same rule the single-author feed applies.
+_VISIBLE = """
+    (u.isPublic OR EXISTS (
+        SELECT 1 FROM friends b WHERE b.login = u.login AND b.friendLogin = %(login)s
+    ))
+"""
+
+
+@instrumented
+class TimelinePostgreClient:
+    """
+    Home timelines: the posts of the users someone has added as friends.
+
+    New posts are pushed into the timeline of every follower of their author
+    when they are written, so reading a page is a range scan of one owner's
+    timeline rows. Authors with more than fanout_limit followers are not pushed;
+    they are recorded in timeline_pull and their recent posts are merged in
+    when a timeline is read instead.
+    """
+
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        fanout_limit: int = 1000,
+        backfill: int = 100,
+    ) -> None:
+        """
+        Initialize the TimelinePostgreClient with a PostgreSQL connection pool.
+
+        Args:
+            pool (PostgresConnectionPool): The shared connection pool.
+            fanout_limit (int): The number of followers above which an author's
+                posts are merged on read rather than pushed on write.
+            backfill (int): The number of an author's latest posts copied into a
+                timeline when its owner adds the author as a friend.
+        """
+
+        self.pool = pool
+        self.fanout_limit = fanout_limit
+        self.backfill = backfill
+
+    def publish(
+        self,
+        post_id: str,
+        author: str,
+        created_at: datetime.datetime,
+        followers: List[str],
+    ) -> bool:
+        """
+        Push a new post into the timelines of its author's followers.
+
+        Args:
+            post_id (str): The id of the new post.
+            author (str): The login of its author.
+            created_at (datetime.datetime): The createdAt stored with the post.
+            followers (List[str]): The logins that added the author as a friend;
+                more than fanout_limit of them switches the author to merge on read.
+
+        Returns:
+            bool: True if the timelines were updated; the post itself is stored
+            either way.
+        """
+
+        try:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                if len(followers) > self.fanout_limit:
+                    cur.execute(
+                        "INSERT INTO timeline_pull (author) VALUES (%s) ON CONFLICT DO NOTHING",
+                        (author,),
+                    )
+                elif followers:
+                    cur.execute(
+                        """
+                        INSERT INTO timelines (owner, post_id, author, createdAt)
+                        SELECT owner, %s, %s, %s FROM unnest(%s::text[]) AS owner
+                        WHERE NOT EXISTS (SELECT 1 FROM timeline_pull WHERE author = %s)
+                        ON CONFLICT DO NOTHING
+                        """,
+                        (post_id, author, created_at, followers, author),
+                    )
+        except:
+            logger.exception("Failed to publish post %s to timelines", post_id)
+            return False
+
+        return True
+
+    def follow(self, login: str, author: str) -> None:
+        """
+        Copy the author's latest posts into the timeline of a user who added them.
+
+        Args:
+            login (str): The owner of the timeline.
+            author (str): The login that was added as a friend.
+        """
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                INSERT INTO timelines (owner, post_id, author, createdAt)
+                SELECT %(login)s, id, author, createdAt FROM posts
+                WHERE author = %(author)s
+                    AND NOT EXISTS (SELECT 1 FROM timeline_pull WHERE author = %(author)s)
+                ORDER BY createdAt DESC, id DESC
+                LIMIT %(backfill)s
+                ON CONFLICT DO NOTHING
+                """,
+                {"login": login, "author": author, "backfill": self.backfill},
+            )
+
+    def unfollow(self, login: str, author: str) -> None:
+        """
+        Remove the author's posts from the timeline of a user who removed them.
+
+        Args:
+            login (str): The owner of the timeline.
+            author (str): The login that was removed from the friends.
+        """
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "DELETE FROM timelines WHERE owner = %s AND author = %s",
+                (login, author),
+            )
+
+    def get_home_timeline(
+        self,
+        login: str,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieve one page of the user's home timeline, newest first.
+
+        Args:
+            login (str): The owner of the timeline.
+            limit (int): The page size.
+            offset (int): The number of posts to skip after the cursor.
+            cursor (Optional[str]): A cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The posts and the cursor of
+            the next page, or None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+
+        params: Dict[str, Any] = {
+            "login": login,
+            "window": limit + offset + 1,
+            "limit": limit + 1,
+            "offset": offset,
+        }
+        pushed_after = pulled_after = ""
+        if cursor is not None:
+            after_created_at, after_id = decode_cursor(cursor)
+            if not isinstance(after_id, str):
+                raise ValueError("Invalid cursor")
+            params.update(after_created_at=after_created_at, after_id=after_id)
+            pushed_after = (
+                "AND (t.createdAt, t.post_id) < (%(after_created_at)s, %(after_id)s)"
+            )
+            pulled_after = "AND (createdAt, id) < (%(after_created_at)s, %(after_id)s)"
+
+        # Both branches stop after the rows the page can need; the merge of
+        # pulled authors is empty unless the user follows one of them.
+        query = """
+            SELECT {columns} FROM posts WHERE id IN (
+                SELECT id FROM (
+                    (
+                        SELECT t.post_id AS id, t.createdAt FROM timelines t
+                        JOIN users u ON u.login = t.author
+                        WHERE t.owner = %(login)s {pushed_after} AND {visible}
+                        ORDER BY t.createdAt DESC, t.post_id DESC
+                        LIMIT %(window)s
+                    )
+                    UNION
+                    (
+                        SELECT p.id, p.createdAt FROM timeline_pull tp
+                        JOIN friends f
+                            ON f.friendLogin = tp.author AND f.login = %(login)s
+                        JOIN users u ON u.login = tp.author
+                        CROSS JOIN LATERAL (
+                            SELECT id, createdAt FROM posts
+                            WHERE author = tp.author {pulled_after}
+                            ORDER BY createdAt DESC, id DESC
+                            LIMIT %(window)s
+                        ) p
+                        WHERE {visible}
+                    )
+                ) candidates
+                ORDER BY createdAt DESC, id DESC
+                LIMIT %(limit)s OFFSET %(offset)s
+            )
+            ORDER BY createdAt DESC, id DESC
+        """.format(
+            columns=POST_COLUMNS,
+            pushed_after=pushed_after,
+            pulled_after=pulled_after,
+            visible=_VISIBLE,
+        )
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(Post.from_row))
+            cur.execute(query, params)
+            posts = cur.fetchall()
+
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = (
+                encode_cursor(posts[-1].createdAt, posts[-1].id) if posts else None
+            )
+
+        return [post.post for post in posts], next_cursor
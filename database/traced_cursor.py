@@ -0,0 +1,109 @@
+import psycopg2.extensions
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+# Called after every statement with (query, params, seconds, cursor).
+QueryListener = Callable[[str, Any, float, Any], None]
+
+_listeners: List[QueryListener] = []
+_local = threading.local()
+
+
+def add_query_listener(listener: QueryListener) -> None:
+    """
+    Register a function called after every statement run on a TracedCursor.
+
+    Args:
+        listener (QueryListener): Receives the query, its parameters, the
+            elapsed seconds and the cursor it ran on.
+    """
+
+    _listeners.append(listener)
+
+
+def remove_query_listener(listener: QueryListener) -> None:
+    """
+    Unregister a listener added with add_query_listener.
+
+    Args:
+        listener (QueryListener): The listener to remove.
+    """
+
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def reset_query_stats() -> None:
+    """
+    Start counting round trips and fetched rows for the current thread from zero.
+    """
+
+    _local.round_trips = 0
+    _local.rows = 0
+
+
+def query_stats() -> Tuple[int, int]:
+    """
+    Report the round trips and fetched rows of the current thread since the last reset.
+
+    Returns:
+        Tuple[int, int]: The number of round trips and of rows fetched.
+    """
+
+    return getattr(_local, "round_trips", 0), getattr(_local, "rows", 0)
+
+
+def _count(round_trips: int = 0, rows: int = 0) -> None:
+    _local.round_trips = getattr(_local, "round_trips", 0) + round_trips
+    _local.rows = getattr(_local, "rows", 0) + rows
+
+
+class TracedCursor(psycopg2.extensions.cursor):
+    """
+    A cursor that counts round trips and fetched rows and notifies query listeners.
+
+    Installed as the cursor_factory of every pooled connection.
+    """
+
+    def execute(self, query: Any, vars: Optional[Any] = None) -> None:
+        started = time.perf_counter()
+        try:
+            super().execute(query, vars)
+        finally:
+            self.__record(query, vars, started)
+
+    def executemany(self, query: Any, vars_list: Any) -> None:
+        started = time.perf_counter()
+        try:
+            super().executemany(query, vars_list)
+        finally:
+            self.__record(query, vars_list, started)
+
+    def __record(self, query: Any, vars: Any, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        _count(round_trips=1)
+        if _listeners:
+            text = query.decode() if isinstance(query, bytes) else str(query)
+            for listener in list(_listeners):
+                listener(text, vars, elapsed, self)
+
+    def fetchone(self) -> Any:
+        row = super().fetchone()
+        _count(round_trips=1 if self.name else 0, rows=int(row is not None))
+        return row
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Any]:
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _count(round_trips=1 if self.name else 0, rows=len(rows))
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        rows = super().fetchall()
+        _count(round_trips=1 if self.name else 0, rows=len(rows))
+        return rows
+
+    def __next__(self) -> Any:
+        row = super().__next__()
+        _count(rows=1)
+        return row
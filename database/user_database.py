@@ -1,61 +1,233 @@
+import datetime
 import psycopg2
-from typing import Optional
-import bcrypt
+import threading
+import time
+from typing import List, Optional
 from ..modules.user import User
+from ..modules.ttl_cache import TTLCache
+from ..modules.password_hasher import PasswordHasher
+from ..modules.identity_filter import IdentityFilter
+from ..modules.login_trie import LoginTrie
+from ..modules.metrics import instrumented
+from .connection_pool import PostgresConnectionPool
+from .row_factory import model_cursor
 import re
 
+# The columns of a users row, in the order User.from_row expects them.
+USER_COLUMNS = "login, email, password, countryCode, isPublic, phone, image, updatedAt"
 
+
+@instrumented
 class UserPostgreClient:
     """
     A class to interact with a PostgreSQL database for user management.
     """
 
-    def __init__(self, ps_connect: Optional[str]) -> None:
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        principal_cache: Optional[TTLCache] = None,
+        password_hasher: Optional[PasswordHasher] = None,
+        identity_filter: Optional[IdentityFilter] = None,
+        login_trie: Optional[LoginTrie] = None,
+        sync_interval: float = 1.0,
+        principal_check_interval: float = 5.0,
+    ) -> None:
         """
-        Initialize the UserPostgreClient with a PostgreSQL connection string.
+        Initialize the UserPostgreClient with a PostgreSQL connection pool.
 
         Args:
-            ps_connect (str): The PostgreSQL connection string.
-        Raises:
-            ValueError: If ps_connect is None.
+            pool (PostgresConnectionPool): The shared connection pool.
+            principal_cache (Optional[TTLCache]): The cache of authenticated users used
+                by TokenClient; entries for a login are dropped whenever it is updated.
+            password_hasher (Optional[PasswordHasher]): The service that hashes new
+                passwords; defaults to hashing on the calling thread.
+            identity_filter (Optional[IdentityFilter]): A filter of registered logins,
+                emails and phones that lets identity_exists skip the database.
+            login_trie (Optional[LoginTrie]): The public logins served by
+                search_logins; without it every search runs in the database.
+            sync_interval (float): Seconds after which identity_exists and
+                search_logins first pick up the users added or changed through
+                other processes.
+            principal_check_interval (float): Seconds TokenClient trusts a cached
+                user before checking that it was not updated by another process.
+        """
+
+        self.pool = pool
+        self.principal_cache = (
+            principal_cache if principal_cache is not None else TTLCache(max_size=0)
+        )
+        self.password_hasher = (
+            password_hasher if password_hasher is not None else PasswordHasher()
+        )
+        self.identity_filter = identity_filter
+        self.login_trie = login_trie
+        self.sync_interval = sync_interval
+        self.principal_check_interval = principal_check_interval
+
+        # The identity filter and the login trie are filled per process, so
+        # both are kept current with the users written by the other workers.
+        self.__sync_lock = threading.Lock()
+        self.__synced_at = 0.0  # time.monotonic() of the last sync
+        # Database time the next sync reads changes from; None until warmed.
+        self.__changes_since: Optional[datetime.datetime] = None
+
+    def warm_identity_filter(self) -> None:
         """
+        Load every registered login, email and phone into the identity filter.
+        """
+
+        if self.identity_filter is None:
+            return
+
+        with self.__sync_lock:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT NOW()")
+                started_at = cur.fetchone()[0]
 
-        if ps_connect is None:
-            raise ValueError("ps_connect cannot be None")
-        self.ps_conn = ps_connect
-        self.init_database()
+                cur = conn.cursor(name="identity_filter_warmup")
+                cur.itersize = 10000
+                cur.execute("SELECT login, email, phone FROM users")
+                for login, email, phone in cur:
+                    self.identity_filter.add(login, email, phone)
+                cur.close()
 
-    def init_database(self) -> None:
+            self.__warmed(started_at)
+
+    def warm_login_trie(self) -> None:
         """
-        Initialize the database by creating the users table if it does not exist.
+        Load every public login into the login trie.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
+        if self.login_trie is None:
+            return
+
+        with self.__sync_lock:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT NOW()")
+                started_at = cur.fetchone()[0]
+
+                cur = conn.cursor(name="login_trie_warmup")
+                cur.itersize = 10000
+                cur.execute("SELECT login FROM users WHERE isPublic")
+                self.login_trie.replace(row[0] for row in cur)
+                cur.close()
+
+            self.__warmed(started_at)
+
+    def __warmed(self, started_at: datetime.datetime) -> None:
+        # Must be called with the sync lock held; the earliest warm-up wins.
+        if self.__changes_since is None or started_at < self.__changes_since:
+            self.__changes_since = started_at
+        self.__synced_at = time.monotonic()
+
+    def __sync_users(self) -> None:
+        # Picks up users added or updated by other processes. updatedAt is the
+        # start of the writing transaction, so a minute of overlap covers
+        # transactions that committed after a later one was already seen.
+        if self.__changes_since is None:
+            return
+
+        with self.pool.connection() as conn:
             cur = conn.cursor()
-
-            cur.execute("DROP TABLE IF EXISTS users")
+            cur.execute("SELECT NOW()")
+            started_at = cur.fetchone()[0]
             cur.execute(
                 """
-                ALTER TABLE countries ADD UNIQUE (alpha2);
-                CREATE TABLE users (
-                    id SERIAL PRIMARY KEY,
-                    login TEXT UNIQUE NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    countryCode TEXT NOT NULL REFERENCES countries(alpha2),
-                    isPublic BOOLEAN NOT NULL,
-                    phone TEXT UNIQUE,
-                    image TEXT,
-                    CHECK (login ~ '^[a-zA-Z0-9-]{1,30}$'),
-                    CHECK (LENGTH(email) <= 50),
-                    CHECK (LENGTH(email) > 0),
-                    CHECK (phone ~ '^\+[\d]+$'),
-                    CHECK (LENGTH(image) <= 200)
-                );
+                SELECT login, email, phone, isPublic FROM users
+                WHERE updatedAt >= %s - interval '1 minute'
+                """,
+                (self.__changes_since,),
+            )
+            for login, email, phone, is_public in cur.fetchall():
+                if self.identity_filter is not None:
+                    self.identity_filter.add(login, email, phone)
+                if self.login_trie is None:
+                    continue
+                if is_public:
+                    self.login_trie.add(login)
+                else:
+                    self.login_trie.remove(login)
+
+        self.__changes_since = started_at
+
+    def __maybe_sync(self) -> None:
+        if time.monotonic() - self.__synced_at <= self.sync_interval:
+            return
+        # Only one thread syncs; the others answer from memory as it is.
+        if self.__sync_lock.acquire(blocking=False):
+            try:
+                self.__sync_users()
+            except:
+                pass
+            finally:
+                self.__synced_at = time.monotonic()
+                self.__sync_lock.release()
+
+    def search_logins(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Find the public logins starting with a prefix, ignoring case.
+
+        Served from the login trie when there is one that has not overflowed,
+        and by an indexed LIKE query otherwise.
+
+        Args:
+            prefix (str): The prefix; must not contain LIKE wildcards.
+            limit (int): The maximum number of logins.
+
+        Returns:
+            List[str]: The logins ordered by lowercase login, then login.
+        """
+
+        if self.login_trie is not None and not self.login_trie.overflowed:
+            self.__maybe_sync()
+            if not self.login_trie.overflowed:
+                return self.login_trie.search(prefix, limit)
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
                 """
+                SELECT login FROM users
+                WHERE isPublic AND lower(login) LIKE %s
+                ORDER BY lower(login) COLLATE "C", login COLLATE "C"
+                LIMIT %s
+                """,
+                (prefix.lower() + "%", limit),
             )
+            return [row[0] for row in cur.fetchall()]
 
-            conn.commit()
+    def identity_exists(self, user: User) -> bool:
+        """
+        Check whether the user's login, email or phone is already registered.
+
+        The identity filter answers "definitely not taken" without a query. It
+        only knows the identities this process has seen: those registered
+        through other workers arrive with the next sync, at most sync_interval
+        seconds later. Until then a duplicate may get past this check, and is
+        rejected by the unique constraints when it is inserted.
+
+        Args:
+            user (User): The user about to be registered.
+
+        Returns:
+            bool: True if any of them is taken.
+        """
+
+        if self.identity_filter is not None:
+            self.__maybe_sync()
+            if not self.identity_filter.might_exist(user.login, user.email, user.phone):
+                return False
+
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT EXISTS (SELECT 1 FROM users WHERE login = %s OR email = %s OR phone = %s)",
+                (user.login, user.email, user.phone),
+            )
+            return cur.fetchone()[0]
 
     def get_user_data(self, login: str) -> Optional[User]:
         """
@@ -65,29 +237,34 @@ class UserPostgreClient:
             login (str): The user's login.
 
         Returns:
-            dict: A dictionary containing user data.
+            Optional[User]: The user, or None if there is no such login.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM users WHERE login = %s", (login,))
-            user_data = cur.fetchone()
+        with self.pool.connection() as conn:
+            cur = conn.cursor(cursor_factory=model_cursor(User.from_row))
+            cur.execute(
+                "SELECT {} FROM users WHERE login = %s".format(USER_COLUMNS),
+                (login,),
+            )
+            return cur.fetchone()
+
+    def get_user_version(self, login: str) -> Optional[datetime.datetime]:
+        """
+        Retrieve the time the user was last updated, by any process.
 
-        if user_data is None:
-            return None
+        Args:
+            login (str): The user's login.
 
-        keys = [
-            "login",
-            "email",
-            "password",
-            "countryCode",
-            "isPublic",
-            "phone",
-            "image",
-        ]
-        result = dict(zip(keys, user_data[1:]))
+        Returns:
+            Optional[datetime.datetime]: The user's updatedAt, or None if there is
+            no such login.
+        """
 
-        return User(**result)
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT updatedAt FROM users WHERE login = %s", (login,))
+            row = cur.fetchone()
+            return row[0] if row else None
 
     def add_user(self, user: User) -> None:
         """
@@ -95,30 +272,38 @@ class UserPostgreClient:
 
         Args:
             user (dict): A dictionary containing user information.
+        Raises:
+            HashingUnavailableError: If the password hasher is overloaded.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+        hashed_password = self.password_hasher.hash(user.password)
 
-            hashed_password = bcrypt.hashpw(
-                user.password.encode("utf-8"), bcrypt.gensalt()
-            )
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
 
             cur.execute(
-                "INSERT INTO users (login, email, password, countryCode, isPublic, phone, image) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                "INSERT INTO users (login, email, password, countryCode, isPublic, phone, image) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING isPublic",
                 (
                     user.login,
                     user.email,
-                    hashed_password.decode("utf-8"),
+                    hashed_password,
                     user.countryCode,
                     user.isPublic,
                     user.phone,
                     user.image,
                 ),
             )
+            # As stored: PostgreSQL casts values such as "false" that Python
+            # would take for true.
+            is_public = cur.fetchone()[0]
 
             conn.commit()
 
+        if self.identity_filter is not None:
+            self.identity_filter.add(user.login, user.email, user.phone)
+        if self.login_trie is not None and is_public:
+            self.login_trie.add(user.login)
+
     def update_user_data(self, login: str, new_data: dict) -> int:
         """
         Update user data in the database.
@@ -128,15 +313,20 @@ class UserPostgreClient:
             new_data (dict): A dictionary containing the new user data.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
+        is_public = None
+        with self.pool.connection() as conn:
             cur = conn.cursor()
 
             try:
                 for key, value in new_data.items():
                     cur.execute(
-                        "UPDATE users SET {} = %s WHERE login = %s".format(key),
+                        "UPDATE users SET {} = %s, updatedAt = NOW() WHERE login = %s RETURNING isPublic".format(
+                            key
+                        ),
                         (value, login),
                     )
+                    row = cur.fetchone()
+                    is_public = row[0] if row else None
             except psycopg2.errors.UniqueViolation:
                 return 409
             except:
@@ -144,6 +334,15 @@ class UserPostgreClient:
 
             conn.commit()
 
+        if self.identity_filter is not None and new_data.get("phone") is not None:
+            self.identity_filter.add(phone=new_data["phone"])
+        if self.login_trie is not None and is_public is not None:
+            # Follows the stored isPublic, not the truthiness of the payload.
+            if is_public:
+                self.login_trie.add(login)
+            else:
+                self.login_trie.remove(login)
+        self.principal_cache.invalidate_tag(login)
         return 200
 
     def change_password(self, login: str, new_password: str) -> int:
@@ -153,24 +352,25 @@ class UserPostgreClient:
         Args:
             login (str): The user's login.
             new_password (str): The new password.
+        Raises:
+            HashingUnavailableError: If the password hasher is overloaded.
         """
 
-        with psycopg2.connect(self.ps_conn) as conn:
-            cur = conn.cursor()
+        hashed_password = self.password_hasher.hash(new_password)
 
-            hashed_password = bcrypt.hashpw(
-                new_password.encode("utf-8"), bcrypt.gensalt()
-            )
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
 
             try:
                 cur.execute(
-                    "UPDATE users SET password = %s WHERE login = %s",
-                    (hashed_password.decode("utf-8"), login),
+                    "UPDATE users SET password = %s, updatedAt = NOW() WHERE login = %s",
+                    (hashed_password, login),
                 )
                 conn.commit()
             except:
                 return 400
 
+        self.principal_cache.invalidate_tag(login)
         return 200
 
     def check_password(self, password: str) -> bool:
@@ -0,0 +1,229 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Content-Encoding -> zlib window bits of the matching container format.
+_ENCODINGS: Dict[str, int] = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+_ETAG_SUFFIX = re.compile(r'-(gzip|deflate)"')
+
+DEFAULT_RULES: Dict[str, int] = {
+    "application/json": 500,
+    "text/plain": 500,
+    "text/html": 500,
+}
+
+
+def parse_rules(spec: str, min_size: int = 500) -> Dict[str, int]:
+    """
+    Parse compression rules written as "type[:min_size],type[:min_size],...".
+
+    Args:
+        spec (str): The rules, e.g. "application/json:500,text/plain".
+        min_size (int): The minimum size of types given without one.
+
+    Returns:
+        Dict[str, int]: Content type -> minimum body size worth compressing.
+
+    Raises:
+        ValueError: If a minimum size is not an integer.
+    """
+
+    rules = {}
+    for item in spec.split(","):
+        content_type, _, size = item.strip().partition(":")
+        if content_type:
+            rules[content_type.strip()] = int(size) if size else min_size
+    return rules
+
+
+def _header(headers: List[Tuple[str, str]], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers: List[Tuple[str, str]], *names: str) -> List[Tuple[str, str]]:
+    lowered = {name.lower() for name in names}
+    return [(key, value) for key, value in headers if key.lower() not in lowered]
+
+
+def _suffixed(etag: str, encoding: str) -> str:
+    # "abc" -> "abc-gzip", W/"abc" -> W/"abc-gzip"
+    return etag[:-1] + "-" + encoding + '"' if etag.endswith('"') else etag
+
+
+class CompressionMiddleware:
+    """
+    A WSGI middleware that gzip- or deflate-encodes responses the client accepts.
+
+    Each representation gets its own ETag ("<tag>-gzip"); the suffix is stripped
+    from If-None-Match before the request reaches the application, so routes only
+    ever deal with their own tags.
+    """
+
+    def __init__(
+        self,
+        app: Callable[..., Iterable[bytes]],
+        level: int = 6,
+        rules: Optional[Dict[str, int]] = None,
+        cache_size: int = 64,
+    ) -> None:
+        """
+        Wrap a WSGI application.
+
+        Args:
+            app (Callable[..., Iterable[bytes]]): The WSGI application to wrap.
+            level (int): The zlib compression level, 1 (fastest) to 9 (smallest).
+            rules (Optional[Dict[str, int]]): Content type -> minimum body size in
+                bytes worth compressing; other content types are sent as is.
+            cache_size (int): The number of compressed public responses kept by
+                ETag, so static payloads are compressed once; 0 disables it.
+        """
+
+        self.app = app
+        self.level = level
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        self.cache_size = cache_size
+
+        self.__cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __negotiate(self, accept_encoding: str) -> Optional[str]:
+        best, best_quality = None, 0.0
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            name = name.strip().lower()
+            quality = 1.0
+            match = re.search(r"q\s*=\s*([0-9.]+)", params)
+            if match:
+                try:
+                    quality = float(match.group(1))
+                except ValueError:
+                    continue
+
+            candidates = list(_ENCODINGS) if name == "*" else [name]
+            for candidate in candidates:
+                if candidate in _ENCODINGS and quality > best_quality:
+                    best, best_quality = candidate, quality
+        return best
+
+    def __compressor(self, encoding: str) -> Any:
+        return zlib.compressobj(self.level, zlib.DEFLATED, _ENCODINGS[encoding])
+
+    def __compress(self, body: bytes, encoding: str, key: Optional[str]) -> bytes:
+        if key is None or self.cache_size <= 0:
+            compressor = self.__compressor(encoding)
+            return compressor.compress(body) + compressor.flush()
+
+        with self.__lock:
+            cached = self.__cache.get((key, encoding))
+            if cached is not None:
+                self.__cache.move_to_end((key, encoding))
+                return cached
+
+        compressor = self.__compressor(encoding)
+        compressed = compressor.compress(body) + compressor.flush()
+        with self.__lock:
+            self.__cache[(key, encoding)] = compressed
+            while len(self.__cache) > self.cache_size:
+                self.__cache.popitem(last=False)
+        return compressed
+
+    def __stream(self, app_iter: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        compressor = self.__compressor(encoding)
+        try:
+            for chunk in app_iter:
+                data = compressor.compress(chunk)
+                # Flush every chunk so streamed responses stay incremental.
+                data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+
+    def __call__(
+        self, environ: Dict[str, Any], start_response: Callable[..., Any]
+    ) -> Iterable[bytes]:
+        encoding = self.__negotiate(environ.get("HTTP_ACCEPT_ENCODING", ""))
+
+        # Map the client's tags for encoded representations back to the route's tags.
+        client_encoding = None
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            match = _ETAG_SUFFIX.search(if_none_match)
+            if match:
+                client_encoding = match.group(1)
+                environ["HTTP_IF_NONE_MATCH"] = _ETAG_SUFFIX.sub('"', if_none_match)
+
+        captured: Dict[str, Any] = {}
+
+        def capture(
+            status: str, headers: List[Tuple[str, str]], exc_info: Any = None
+        ) -> Callable[[bytes], None]:
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return lambda data: None  # Flask never uses the write callable
+
+        app_iter = self.app(environ, capture)
+        status: str = captured["status"]
+        headers: List[Tuple[str, str]] = captured["headers"]
+        exc_info = captured["exc_info"]
+
+        etag = _header(headers, "ETag")
+        if status.startswith("304") and etag is not None and client_encoding:
+            headers = _without(headers, "ETag") + [
+                ("ETag", _suffixed(etag, client_encoding))
+            ]
+
+        content_type = (_header(headers, "Content-Type") or "").split(";")[0].strip()
+        min_size = self.rules.get(content_type)
+        if min_size is None or not status.startswith("200"):
+            start_response(status, headers, exc_info)
+            return app_iter
+
+        headers = _without(headers, "Vary") + [
+            (
+                "Vary",
+                ", ".join(filter(None, [_header(headers, "Vary"), "Accept-Encoding"])),
+            )
+        ]
+        length = _header(headers, "Content-Length")
+        if (
+            encoding is None
+            or environ.get("REQUEST_METHOD") == "HEAD"
+            or _header(headers, "Content-Encoding") is not None
+            or "no-transform" in (_header(headers, "Cache-Control") or "")
+            or (length is not None and int(length) < min_size)
+        ):
+            start_response(status, headers, exc_info)
+            return app_iter
+
+        headers = _without(headers, "Content-Length", "ETag") + [
+            ("Content-Encoding", encoding)
+        ]
+        if etag is not None:
+            headers.append(("ETag", _suffixed(etag, encoding)))
+
+        if length is None:
+            start_response(status, headers, exc_info)
+            return self.__stream(app_iter, encoding)
+
+        try:
+            body = b"".join(app_iter)
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+
+        public = "public" in (_header(headers, "Cache-Control") or "")
+        compressed = self.__compress(body, encoding, etag if public else None)
+        headers.append(("Content-Length", str(len(compressed))))
+        start_response(status, headers, exc_info)
+        return [compressed]
@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from ..database.countries_database import CountryPostgreClient
+from .http_cache import make_etag
+
+
+def _to_json(data: Any) -> bytes:
+    # Same layout as flask.jsonify with the default JSON provider.
+    return (json.dumps(data, separators=(",", ":"), sort_keys=True) + "\n").encode()
+
+
+class _CatalogSnapshot:
+    def __init__(self, rows: List[Any]) -> None:
+        self.loaded_at = time.monotonic()
+        self.countries: List[Dict[str, str]] = [
+            {"name": row[0], "alpha2": row[1], "alpha3": row[2], "region": row[3]}
+            for row in rows
+        ]  # ordered by alpha2, as returned by the database
+
+        self.by_alpha2: Dict[str, Dict[str, str]] = {}
+        self.by_region: Dict[str, List[Dict[str, str]]] = {}
+        for country in self.countries:
+            self.by_alpha2[country["alpha2"]] = country
+            self.by_region.setdefault(country["region"], []).append(country)
+
+        self.country_bodies: Dict[str, bytes] = {
+            alpha2: _to_json(country) for alpha2, country in self.by_alpha2.items()
+        }
+
+        # The full list and every single-region list are what clients ask for.
+        self.region_bodies: Dict[Tuple[str, ...], bytes] = {
+            (): _to_json(self.countries)
+        }
+        for region, countries in self.by_region.items():
+            self.region_bodies[(region,)] = _to_json(countries)
+
+        self.etags: Dict[bytes, str] = {}  # body -> entity tag
+
+
+class CountryCatalog:
+    """
+    An in-memory, read-mostly copy of the countries table with precomputed JSON responses.
+    """
+
+    def __init__(
+        self, country_database: CountryPostgreClient, ttl: float = 3600.0
+    ) -> None:
+        """
+        Load the catalog from the database.
+
+        Args:
+            country_database (CountryPostgreClient): The country database object.
+            ttl (float): Seconds after which the catalog is reloaded on access; 0 disables expiry.
+        """
+
+        self.country_database = country_database
+        self.ttl = ttl
+        self.__reload_lock = threading.Lock()
+        self.__snapshot = _CatalogSnapshot(self.country_database.filter_region(None))
+
+    def reload(self) -> None:
+        """
+        Rebuild the catalog from the database and swap it in atomically.
+        """
+
+        with self.__reload_lock:
+            self.__snapshot = _CatalogSnapshot(
+                self.country_database.filter_region(None)
+            )
+
+    def __current(self) -> _CatalogSnapshot:
+        snapshot = self.__snapshot
+        if self.ttl and time.monotonic() - snapshot.loaded_at > self.ttl:
+            # Only one thread refreshes; the others keep serving the old snapshot.
+            if self.__reload_lock.acquire(blocking=False):
+                try:
+                    self.__snapshot = _CatalogSnapshot(
+                        self.country_database.filter_region(None)
+                    )
+                except:
+                    snapshot.loaded_at = time.monotonic()  # retry after another ttl
+                finally:
+                    self.__reload_lock.release()
+                snapshot = self.__snapshot
+        return snapshot
+
+    def has_country(self, alpha2: Optional[str]) -> bool:
+        """
+        Check whether a country with the given alpha2 code exists.
+
+        Args:
+            alpha2 (Optional[str]): The alpha2 code of the country.
+
+        Returns:
+            bool: True if the country exists.
+        """
+
+        return alpha2 in self.__current().by_alpha2
+
+    def get_country(self, alpha2: str) -> Optional[Dict[str, str]]:
+        """
+        Retrieve a country by its alpha2 code.
+
+        Args:
+            alpha2 (str): The alpha2 code of the country.
+
+        Returns:
+            Optional[Dict[str, str]]: The country data, or None if not found.
+        """
+
+        return self.__current().by_alpha2.get(alpha2)
+
+    def country_json(self, alpha2: str) -> Optional[bytes]:
+        """
+        Retrieve the serialized JSON of a country by its alpha2 code.
+
+        Args:
+            alpha2 (str): The alpha2 code of the country.
+
+        Returns:
+            Optional[bytes]: The JSON body, or None if not found.
+        """
+
+        return self.__current().country_bodies.get(alpha2)
+
+    def regions_json(self, regions: List[str]) -> Optional[bytes]:
+        """
+        Retrieve the serialized JSON list of countries in the given regions.
+
+        Args:
+            regions (List[str]): The regions to filter by; an empty list means all countries.
+
+        Returns:
+            Optional[bytes]: The JSON body ordered by alpha2, or None if a region is
+            unknown or repeated.
+        """
+
+        snapshot = self.__current()
+        key = tuple(sorted(set(regions)))
+        if len(key) != len(regions):
+            return None
+
+        body = snapshot.region_bodies.get(key)
+        if body is not None:
+            return body
+
+        if any(region not in snapshot.by_region for region in key):
+            return None
+
+        countries = sorted(
+            (country for region in key for country in snapshot.by_region[region]),
+            key=lambda country: country["alpha2"],
+        )
+        body = _to_json(countries)
+        snapshot.region_bodies[key] = body  # at most one entry per region subset
+        return body
+
+    def etag(self, body: bytes) -> str:
+        """
+        Retrieve the entity tag of a body returned by country_json or regions_json.
+
+        Args:
+            body (bytes): The serialized JSON body.
+
+        Returns:
+            str: The unquoted entity tag, computed once per body.
+        """
+
+        etags = self.__current().etags
+        etag = etags.get(body)
+        if etag is None:
+            etag = etags[body] = make_etag(body)
+        return etag
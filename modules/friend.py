@@ -0,0 +1,57 @@
+import datetime
+from typing import Any, Optional, Sequence
+
+
+def format_added_at(date: datetime.datetime) -> str:
+    """
+    Render the time a friend was added the way the friends list returns it.
+
+    Args:
+        date (datetime.datetime): The aware timestamp stored in friends.date.
+
+    Returns:
+        str: The timestamp, e.g. "2024-03-01T12:30:00Z03:00".
+    """
+
+    offset = date.strftime("%z")
+    return date.strftime("%Y-%m-%dT%H:%M:%S") + "Z" + offset[1:3] + ":" + offset[3:]
+
+
+class Friend:
+    """
+    One entry of a user's friends list.
+
+    The serialized form returned by friend is computed on first use and shared
+    by every later call.
+    """
+
+    __slots__ = ("id", "login", "addedAt", "__serialized")
+
+    def __init__(self, friend_id: Any, login: str, addedAt: datetime.datetime):
+        self.id = friend_id
+        self.login = login
+        self.addedAt = addedAt
+        self.__serialized: Optional[dict] = None
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "Friend":
+        """
+        Build a friend from a row of the id, friendLogin and date columns.
+
+        Args:
+            row (Sequence[Any]): The row.
+
+        Returns:
+            Friend: The friend.
+        """
+
+        return cls(*row)
+
+    @property
+    def friend(self) -> dict:
+        if self.__serialized is None:
+            self.__serialized = {
+                "login": self.login,
+                "addedAt": format_added_at(self.addedAt),
+            }
+        return self.__serialized
@@ -0,0 +1,240 @@
+import bisect
+import heapq
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+class FriendGraph:
+    """
+    A compact in-memory copy of the friends table for friend-of-friend suggestions.
+
+    Logins are interned to integers and the friend lists are stored CSR style:
+    the sorted ids of the logins u added are neighbors[offsets[u]:offsets[u + 1]].
+    The arrays are rebuilt from the database with replace(); friends added and
+    removed in between are kept in small per-login overlays on top of them.
+    """
+
+    def __init__(self, max_paths: int = 50_000) -> None:
+        """
+        Initialize an empty graph.
+
+        Args:
+            max_paths (int): The maximum number of two-hop paths counted per
+                suggestion; past it, the friends with the longest friend lists
+                are left out of the ranking.
+        """
+
+        self.max_paths = max_paths
+
+        self.__lock = threading.Lock()
+        self.__rebuild_lock = threading.Lock()
+
+        self.__ids: Dict[str, int] = {}
+        self.__logins: List[str] = []
+        self.__offsets = array("i", [0])
+        self.__neighbors = array("i")
+        self.__added: Dict[int, Set[int]] = {}
+        self.__removed: Dict[int, Set[int]] = {}
+        # (added, login, friend_login) changes made during a rebuild, or None.
+        self.__journal: Optional[List[Tuple[bool, str, str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.__logins)
+
+    def __intern(self, login: str) -> int:
+        # Must be called with the lock held.
+        node = self.__ids.get(login)
+        if node is None:
+            node = self.__ids[login] = len(self.__logins)
+            self.__logins.append(login)
+        return node
+
+    def __in_base(self, node: int, friend: int) -> bool:
+        if node + 1 >= len(self.__offsets):
+            return False  # interned after the last rebuild
+        lo, hi = self.__offsets[node], self.__offsets[node + 1]
+        i = bisect.bisect_left(self.__neighbors, friend, lo, hi)
+        return i < hi and self.__neighbors[i] == friend
+
+    def __friends(self, node: int) -> Sequence[int]:
+        # Must be called with the lock held.
+        if node + 1 < len(self.__offsets):
+            base = self.__neighbors[self.__offsets[node] : self.__offsets[node + 1]]
+        else:
+            base = array("i")
+        added, removed = self.__added.get(node), self.__removed.get(node)
+        if not added and not removed:
+            return base
+        return [friend for friend in base if not removed or friend not in removed] + (
+            list(added) if added else []
+        )
+
+    def __apply(self, added: bool, login: str, friend_login: str) -> None:
+        # Must be called with the lock held.
+        node, friend = self.__intern(login), self.__intern(friend_login)
+        present, absent = (
+            (self.__added, self.__removed) if added else (self.__removed, self.__added)
+        )
+        pending = absent.get(node)
+        if pending is not None and friend in pending:
+            pending.discard(friend)  # undoes a change made since the rebuild
+            if not pending:
+                del absent[node]
+        elif self.__in_base(node, friend) != added:
+            present.setdefault(node, set()).add(friend)
+
+    def add(self, login: str, friend_login: str) -> None:
+        """
+        Record that login added friend_login as a friend.
+
+        Args:
+            login (str): The login of the user who owns the friend list.
+            friend_login (str): The added login.
+        """
+
+        with self.__lock:
+            if self.__journal is not None:
+                self.__journal.append((True, login, friend_login))
+            self.__apply(True, login, friend_login)
+
+    def remove(self, login: str, friend_login: str) -> None:
+        """
+        Record that login removed friend_login from their friends.
+
+        Args:
+            login (str): The login of the user who owns the friend list.
+            friend_login (str): The removed login.
+        """
+
+        with self.__lock:
+            if self.__journal is not None:
+                self.__journal.append((False, login, friend_login))
+            self.__apply(False, login, friend_login)
+
+    def replace(self, edges: Iterable[Tuple[str, str]]) -> None:
+        """
+        Rebuild the graph from scratch.
+
+        Changes recorded while the edges are read are applied again on top of
+        the new arrays, so edges may be a generator that queries the database
+        lazily.
+
+        Args:
+            edges (Iterable[Tuple[str, str]]): Every (login, friendLogin) pair,
+                each at most once.
+        """
+
+        with self.__rebuild_lock:
+            with self.__lock:
+                self.__journal = []
+
+            try:
+                ids: Dict[str, int] = {}
+                logins: List[str] = []
+                sources, targets = array("i"), array("i")
+                for login, friend_login in edges:
+                    for name in (login, friend_login):
+                        if name not in ids:
+                            ids[name] = len(logins)
+                            logins.append(name)
+                    sources.append(ids[login])
+                    targets.append(ids[friend_login])
+
+                # Counting sort of the edges by source, then sort every row.
+                offsets = array("i", bytes(4 * (len(logins) + 1)))
+                for source in sources:
+                    offsets[source + 1] += 1
+                for node in range(len(logins)):
+                    offsets[node + 1] += offsets[node]
+                neighbors = array("i", bytes(4 * len(targets)))
+                fill = offsets[:-1]
+                for source, target in zip(sources, targets):
+                    neighbors[fill[source]] = target
+                    fill[source] += 1
+                for node in range(len(logins)):
+                    lo, hi = offsets[node], offsets[node + 1]
+                    if hi - lo > 1:
+                        neighbors[lo:hi] = array("i", sorted(neighbors[lo:hi]))
+            except:
+                with self.__lock:
+                    self.__journal = None
+                raise
+
+            with self.__lock:
+                journal, self.__journal = self.__journal, None
+                self.__ids, self.__logins = ids, logins
+                self.__offsets, self.__neighbors = offsets, neighbors
+                self.__added, self.__removed = {}, {}
+                for added, login, friend_login in journal:
+                    self.__apply(added, login, friend_login)
+
+    def suggest(self, login: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Rank the friends of a user's friends by the number of mutual friends.
+
+        A candidate's score is the number of the user's friends who have added
+        the candidate. The user and the logins they already added are skipped.
+        For users whose friends have more than max_paths friends in total, the
+        score only counts the friends expanded within that budget.
+
+        Args:
+            login (str): The user's login.
+            limit (int): The maximum number of candidates.
+
+        Returns:
+            List[Tuple[str, int]]: (login, mutual friends) pairs, most mutual
+            friends first, ties by login.
+        """
+
+        # Only the friend lists are copied under the lock; the counting runs
+        # without it, so add() and remove() are not held up.
+        with self.__lock:
+            node = self.__ids.get(login)
+            if node is None or limit <= 0:
+                return []
+            logins = self.__logins  # only ever appended to once published
+            friends = self.__friends(node)
+            rows = [self.__friends(friend) for friend in friends]
+
+        # Past max_paths, expand the friends with the fewest friends first:
+        # they are the cheapest to count and the most telling.
+        if sum(len(row) for row in rows) > self.max_paths:
+            rows.sort(key=len)
+            budget = self.max_paths
+            for i, row in enumerate(rows):
+                budget -= len(row)
+                if budget < 0:
+                    del rows[i:]
+                    break
+
+        counts: Counter = Counter()
+        for row in rows:
+            counts.update(row)
+        counts.pop(node, None)
+        for friend in friends:
+            counts.pop(friend, None)
+        if not counts:
+            return []
+
+        # Only the candidates tied with the limit-th score need their logins
+        # compared; everything above it makes the page anyway.
+        threshold = min(heapq.nlargest(limit, counts.values()))
+        ranked = sorted(
+            (-count, logins[candidate])
+            for candidate, count in counts.items()
+            if count > threshold
+        )
+        ranked += (
+            (-threshold, candidate)
+            for candidate in heapq.nsmallest(
+                limit - len(ranked),
+                (
+                    logins[candidate]
+                    for candidate, count in counts.items()
+                    if count == threshold
+                ),
+            )
+        )
+        return [(candidate, -count) for count, candidate in ranked]
@@ -0,0 +1,125 @@
+import datetime
+import hashlib
+from typing import Any, Optional
+from flask import Blueprint, Request, Response, request as current_request
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong entity tag from the values that determine a response body.
+
+    Args:
+        *parts (Any): The values, e.g. a row key and its version.
+
+    Returns:
+        str: The unquoted entity tag.
+    """
+
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _http_date(
+    last_modified: Optional[datetime.datetime],
+) -> Optional[datetime.datetime]:
+    # HTTP dates have whole seconds, so a Last-Modified within the current
+    # second would also match a later change in that second; it is left out
+    # until the second has passed and the ETag alone validates the response.
+    if last_modified is None:
+        return None
+    last_modified = last_modified.replace(microsecond=0)
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    if last_modified >= now:
+        return None
+    return last_modified
+
+
+def is_fresh(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime.datetime] = None,
+) -> bool:
+    """
+    Check whether the client's cached copy is still current.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when the request has no If-None-Match header.
+
+    Args:
+        request (Request): The incoming request.
+        etag (str): The entity tag of the current representation.
+        last_modified (Optional[datetime.datetime]): When the resource last changed.
+
+    Returns:
+        bool: True if a 304 response can be sent instead of the body.
+    """
+
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+
+    return False
+
+
+def with_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime.datetime] = None,
+) -> Response:
+    """
+    Attach the ETag and Last-Modified headers to a response.
+
+    Last-Modified is only sent once it is at least a second old.
+
+    Args:
+        response (Response): The response to update.
+        etag (str): The entity tag of the representation.
+        last_modified (Optional[datetime.datetime]): When the resource last changed.
+
+    Returns:
+        Response: The same response.
+    """
+
+    response.set_etag(etag)
+    last_modified = _http_date(last_modified)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def not_modified(
+    etag: str, last_modified: Optional[datetime.datetime] = None
+) -> Response:
+    """
+    Build an empty 304 response carrying the current validators.
+
+    Args:
+        etag (str): The entity tag of the representation.
+        last_modified (Optional[datetime.datetime]): When the resource last changed.
+
+    Returns:
+        Response: The 304 response.
+    """
+
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def cache_control(blueprint: Blueprint, value: str) -> None:
+    """
+    Send a Cache-Control header with every successful GET response of a blueprint.
+
+    Args:
+        blueprint (Blueprint): The blueprint whose responses get the header.
+        value (str): The header value, e.g. "private, no-cache".
+    """
+
+    @blueprint.after_request
+    def add_cache_control(response: Response) -> Response:
+        if (
+            current_request.method in ("GET", "HEAD")
+            and response.status_code in (200, 304)
+            and "Cache-Control" not in response.headers
+        ):
+            response.headers["Cache-Control"] = value
+        return response
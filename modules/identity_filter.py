@@ -0,0 +1,121 @@
+import hashlib
+import math
+import threading
+from typing import Optional
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter over strings.
+    """
+
+    def __init__(
+        self, capacity: int, error_rate: float, max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Size the filter for the expected number of keys and false-positive rate.
+
+        Args:
+            capacity (int): The expected number of keys.
+            error_rate (float): The target false-positive rate at full capacity.
+            max_bytes (Optional[int]): An upper bound on the bit array size; when it
+                binds, the false-positive rate ends up higher than error_rate.
+        """
+
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if max_bytes is not None:
+            bits = min(bits, max_bytes * 8)
+
+        self.size = max(bits, 8)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.__bits = bytearray((self.size + 7) // 8)
+        self.__lock = threading.Lock()
+
+    def __positions(self, key: str) -> list:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        positions = self.__positions(key)
+        with self.__lock:
+            for position in positions:
+                self.__bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.__bits[position >> 3] & (1 << (position & 7))
+            for position in self.__positions(key)
+        )
+
+
+class IdentityFilter:
+    """
+    Remembers every login, email and phone ever registered.
+
+    A negative answer is definite, so registration can skip the exact
+    database check; a positive answer must be confirmed by the database.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.01,
+        max_bytes: Optional[int] = 16 * 1024 * 1024,
+    ) -> None:
+        """
+        Initialize an empty filter.
+
+        Args:
+            capacity (int): The expected number of users.
+            error_rate (float): The target false-positive rate per identity.
+            max_bytes (Optional[int]): The memory budget of the bit array.
+        """
+
+        # Each user contributes up to three keys.
+        self.bloom = BloomFilter(3 * capacity, error_rate, max_bytes)
+
+    def add(
+        self,
+        login: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> None:
+        """
+        Record the identities of a user.
+
+        Args:
+            login (Optional[str]): The user's login.
+            email (Optional[str]): The user's email.
+            phone (Optional[str]): The user's phone.
+        """
+
+        for prefix, value in (("login", login), ("email", email), ("phone", phone)):
+            if value is not None:
+                self.bloom.add("{}:{}".format(prefix, value))
+
+    def might_exist(
+        self,
+        login: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+    ) -> bool:
+        """
+        Check whether any of the identities may already be registered.
+
+        Args:
+            login (Optional[str]): The login to check.
+            email (Optional[str]): The email to check.
+            phone (Optional[str]): The phone to check.
+
+        Returns:
+            bool: False if none of them is registered, True if one might be.
+        """
+
+        return any(
+            "{}:{}".format(prefix, value) in self.bloom
+            for prefix, value in (("login", login), ("email", email), ("phone", phone))
+            if value is not None
+        )
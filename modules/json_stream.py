@@ -0,0 +1,26 @@
+from typing import Any, Callable, Iterable, Iterator, List
+
+
+def json_array(
+    chunks: Iterable[List[Any]], dumps: Callable[[Any], str], end: str = "]"
+) -> Iterator[str]:
+    """
+    Serialize chunks of items as one JSON array, one string per chunk.
+
+    Args:
+        chunks (Iterable[List[Any]]): The items, in chunks.
+        dumps (Callable[[Any], str]): Serializes a single item.
+        end (str): The text that closes the array.
+
+    Yields:
+        str: The next piece of the JSON array.
+    """
+
+    yield "["
+    separator = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        yield separator + ",".join(dumps(item) for item in chunk)
+        separator = ","
+    yield end
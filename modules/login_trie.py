@@ -0,0 +1,161 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class _Node:
+    __slots__ = ("children", "logins")
+
+    def __init__(self) -> None:
+        self.children: Optional[Dict[str, "_Node"]] = None
+        self.logins: Optional[List[str]] = None  # logins equal to this key, sorted
+
+
+class LoginTrie:
+    """
+    A thread-safe prefix tree of logins for case-insensitive autocomplete.
+
+    Logins are keyed by their lowercase form and returned in the order of
+    ORDER BY lower(login) COLLATE "C", login, so the SQL fallback agrees with it.
+    """
+
+    def __init__(self, capacity: int = 1_000_000) -> None:
+        """
+        Initialize an empty trie.
+
+        Args:
+            capacity (int): The maximum number of logins; adding more marks the
+                trie as overflowed, and callers should fall back to the database.
+        """
+
+        self.capacity = capacity
+        self.overflowed = False
+
+        self.__root = _Node()
+        self.__size = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def add(self, login: str) -> None:
+        """
+        Add a login; adding it again has no effect.
+
+        Args:
+            login (str): The login.
+        """
+
+        with self.__lock:
+            if self.overflowed:
+                return
+
+            node = self.__root
+            for char in login.lower():
+                if node.children is None:
+                    node.children = {}
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                node = child
+
+            if node.logins is None:
+                node.logins = []
+            if login in node.logins:
+                return
+            node.logins.append(login)
+            node.logins.sort()
+
+            self.__size += 1
+            if self.__size > self.capacity:
+                self.overflowed = True
+
+    def remove(self, login: str) -> None:
+        """
+        Remove a login if present, pruning the branches it leaves empty.
+
+        Args:
+            login (str): The login.
+        """
+
+        with self.__lock:
+            path = [self.__root]
+            for char in login.lower():
+                children = path[-1].children
+                child = children.get(char) if children is not None else None
+                if child is None:
+                    return
+                path.append(child)
+
+            node = path[-1]
+            if node.logins is None or login not in node.logins:
+                return
+            node.logins.remove(login)
+            if not node.logins:
+                node.logins = None
+            self.__size -= 1
+
+            key = login.lower()
+            for depth in range(len(key), 0, -1):
+                node = path[depth]
+                if node.logins is not None or node.children:
+                    break
+                parent = path[depth - 1]
+                del parent.children[key[depth - 1]]
+                if not parent.children:
+                    parent.children = None
+
+    def replace(self, logins: Iterable[str]) -> None:
+        """
+        Rebuild the trie from scratch.
+
+        Args:
+            logins (Iterable[str]): Every login the trie should hold.
+        """
+
+        fresh = LoginTrie(self.capacity)
+        for login in logins:
+            fresh.add(login)
+            if fresh.overflowed:
+                break
+
+        with self.__lock:
+            self.__root = fresh.__root
+            self.__size = fresh.__size
+            self.overflowed = fresh.overflowed
+
+    def search(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Retrieve the first logins starting with a prefix, ignoring case.
+
+        Args:
+            prefix (str): The prefix.
+            limit (int): The maximum number of logins.
+
+        Returns:
+            List[str]: The matching logins in lowercase-then-exact order.
+        """
+
+        result: List[str] = []
+        with self.__lock:
+            node: Optional[_Node] = self.__root
+            for char in prefix.lower():
+                children = node.children if node is not None else None
+                node = children.get(char) if children is not None else None
+            if node is None or limit <= 0:
+                return result
+
+            # Depth-first in character order visits keys in sorted order, and
+            # stops as soon as the page is full.
+            stack = [node]
+            while stack:
+                node = stack.pop()
+                if node.logins is not None:
+                    result.extend(node.logins[: limit - len(result)])
+                    if len(result) >= limit:
+                        break
+                if node.children:
+                    stack.extend(
+                        node.children[char]
+                        for char in sorted(node.children, reverse=True)
+                    )
+        return result
@@ -0,0 +1,163 @@
+import functools
+import os
+import time
+from typing import Any, Callable, Type, TypeVar
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from ..database.traced_cursor import query_stats, reset_query_stats
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker process writes its samples to
+# that directory and a scrape of any worker aggregates all of them.
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by endpoint, method and status code.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, until the response is returned to the server.",
+    ["endpoint", "method"],
+)
+REQUEST_ROUND_TRIPS = Histogram(
+    "http_request_db_round_trips",
+    "Database round trips made while handling a request.",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100),
+)
+REQUEST_ROWS = Counter(
+    "http_request_db_rows_total",
+    "Database rows fetched while handling requests.",
+    ["endpoint"],
+)
+DB_CALL_SECONDS = Histogram(
+    "db_client_call_duration_seconds",
+    "Time spent in public methods of the database clients.",
+    ["client", "method"],
+)
+DB_CALL_ERRORS = Counter(
+    "db_client_call_errors_total",
+    "Exceptions raised by public methods of the database clients.",
+    ["client", "method"],
+)
+BCRYPT_SECONDS = Histogram(
+    "bcrypt_duration_seconds",
+    "Time spent hashing or verifying a password, including queueing.",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+BCRYPT_REJECTED = Counter(
+    "bcrypt_rejected_total",
+    "Password hashing calls rejected because the queue was full or timed out.",
+    ["operation", "reason"],
+)
+
+T = TypeVar("T")
+
+
+def instrumented(cls: Type[T]) -> Type[T]:
+    """
+    Class decorator timing every public method of a database client.
+
+    Args:
+        cls (Type[T]): The client class.
+
+    Returns:
+        Type[T]: The same class with its public methods wrapped.
+    """
+
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not callable(method):
+            continue
+        setattr(cls, name, _timed(cls.__name__, name, method))
+    return cls
+
+
+def _timed(client: str, name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    seconds = DB_CALL_SECONDS.labels(client, name)
+    errors = DB_CALL_ERRORS.labels(client, name)
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def start_request() -> None:
+    """
+    Start timing the current request; registered with app.before_request.
+    """
+
+    g.metrics_started = time.perf_counter()
+    reset_query_stats()
+
+
+def finish_request(response: Response) -> Response:
+    """
+    Record the current request; registered with app.after_request.
+
+    Args:
+        response (Response): The response about to be sent.
+
+    Returns:
+        Response: The same response.
+    """
+
+    started = g.get("metrics_started")
+    if started is None:
+        return response
+
+    endpoint = request.endpoint or "unmatched"  # bounded, unlike the raw path
+    round_trips, rows = query_stats()
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    REQUEST_SECONDS.labels(endpoint, request.method).observe(
+        time.perf_counter() - started
+    )
+    REQUEST_ROUND_TRIPS.labels(endpoint).observe(round_trips)
+    if rows:
+        REQUEST_ROWS.labels(endpoint).inc(rows)
+    return response
+
+
+def render() -> tuple[bytes, str]:
+    """
+    Serialize every metric in the Prometheus text format.
+
+    Returns:
+        tuple[bytes, str]: The exposition and its content type.
+    """
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """
+    Drop the live samples of a worker that exited; called by the server master.
+
+    Args:
+        pid (int): The process id of the worker.
+    """
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,82 @@
+import base64
+import datetime
+import json
+from typing import Any, Tuple
+
+
+def encode_cursor(created_at: datetime.datetime, row_id: Any) -> str:
+    """
+    Build an opaque keyset cursor pointing just past the given row.
+
+    Args:
+        created_at (datetime.datetime): The sort timestamp of the last row on the page.
+        row_id (Any): The primary key of the last row, used as a tie breaker.
+
+    Returns:
+        str: A URL-safe token.
+    """
+
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime.datetime, Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        token (str): The cursor received from the client.
+
+    Returns:
+        Tuple[datetime.datetime, Any]: The timestamp and id of the last row already seen.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), row_id
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_rank_cursor(rank: float, row_id: Any) -> str:
+    """
+    Build an opaque keyset cursor for results ordered by a relevance rank.
+
+    Args:
+        rank (float): The rank of the last row on the page.
+        row_id (Any): The primary key of the last row, used as a tie breaker.
+
+    Returns:
+        str: A URL-safe token.
+    """
+
+    raw = json.dumps([rank, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_rank_cursor(token: str) -> Tuple[float, Any]:
+    """
+    Decode a cursor produced by encode_rank_cursor.
+
+    Args:
+        token (str): The cursor received from the client.
+
+    Returns:
+        Tuple[float, Any]: The rank and id of the last row already seen.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        rank, row_id = json.loads(raw)
+        if isinstance(rank, bool) or not isinstance(rank, (int, float)):
+            raise ValueError("Invalid rank")
+        return float(rank), row_id
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,201 @@
+import bcrypt
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+from .metrics import BCRYPT_REJECTED, BCRYPT_SECONDS
+
+
+class HashingUnavailableError(Exception):
+    """
+    Raised when the hashing queue is full or a hashing call exceeds its timeout.
+    """
+
+
+def _reset_signals() -> None:
+    # Hashing processes are forked from server workers; let them die on SIGTERM.
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGQUIT):
+        signal.signal(sig, signal.SIG_DFL)
+
+
+def _hash_password(password: bytes) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt())
+
+
+def _check_password(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a pool of worker processes.
+
+    At most max_queue calls may be queued or running at once; further calls are
+    rejected immediately so that a sign-in storm cannot tie up every request thread.
+    """
+
+    def __init__(
+        self, workers: int = 0, max_queue: int = 64, timeout: float = 5.0
+    ) -> None:
+        """
+        Initialize the PasswordHasher; the processes start on first use or start().
+
+        Args:
+            workers (int): The number of hashing processes; 0 hashes on the calling thread.
+            max_queue (int): The maximum number of calls queued or running at once.
+            timeout (float): Seconds to wait for a single call before giving up.
+        """
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self.__slots = threading.BoundedSemaphore(max_queue)
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__executor_pid: Optional[int] = None
+        self.__lock = threading.Lock()
+
+        self.__depth = 0
+        self.__stats: Dict[str, float] = {
+            "calls": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "seconds_total": 0.0,
+            "seconds_max": 0.0,
+            "queue_depth_max": 0,
+        }
+
+    def start(self) -> None:
+        """
+        Start the hashing processes for the current process.
+
+        Call it before the server starts request threads, so the processes are
+        forked from a single-threaded parent.
+        """
+
+        if self.workers <= 0 or self.__executor_pid == os.getpid():
+            return
+
+        with self.__lock:
+            if self.__executor_pid == os.getpid():
+                return
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_reset_signals,
+            )
+            self.__executor_pid = os.getpid()
+
+        # Forking executors launch every process on the first submit.
+        self.__executor.submit(int).result()
+
+    def __run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        if not self.__slots.acquire(blocking=False):
+            with self.__lock:
+                self.__stats["rejected"] += 1
+            BCRYPT_REJECTED.labels(operation, "queue_full").inc()
+            raise HashingUnavailableError("Hashing queue is full")
+
+        with self.__lock:
+            self.__depth += 1
+            self.__stats["queue_depth_max"] = max(
+                self.__stats["queue_depth_max"], self.__depth
+            )
+
+        def done(_: Any = None) -> None:
+            with self.__lock:
+                self.__depth -= 1
+            self.__slots.release()
+
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                try:
+                    return func(*args)
+                finally:
+                    done()
+
+            self.start()
+            assert self.__executor is not None
+            future: Future = self.__executor.submit(func, *args)
+            future.add_done_callback(done)  # the slot stays taken until the work ends
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                with self.__lock:
+                    self.__stats["timeouts"] += 1
+                BCRYPT_REJECTED.labels(operation, "timeout").inc()
+                raise HashingUnavailableError("Hashing timed out")
+        finally:
+            elapsed = time.perf_counter() - started
+            BCRYPT_SECONDS.labels(operation).observe(elapsed)
+            with self.__lock:
+                self.__stats["calls"] += 1
+                self.__stats["seconds_total"] += elapsed
+                self.__stats["seconds_max"] = max(self.__stats["seconds_max"], elapsed)
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password with a fresh salt.
+
+        Args:
+            password (str): The plain text password.
+
+        Returns:
+            str: The bcrypt hash.
+
+        Raises:
+            HashingUnavailableError: If the queue is full or the call times out.
+        """
+
+        return self.__run("hash", _hash_password, password.encode("utf-8")).decode(
+            "utf-8"
+        )
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """
+        Check a password against a bcrypt hash.
+
+        Args:
+            password (str): The plain text password.
+            hashed (str): The stored bcrypt hash.
+
+        Returns:
+            bool: True if the password matches.
+
+        Raises:
+            HashingUnavailableError: If the queue is full or the call times out.
+        """
+
+        return self.__run(
+            "verify", _check_password, password.encode("utf-8"), hashed.encode("utf-8")
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report queue depth and latency counters.
+
+        Returns:
+            Dict[str, float]: Call, rejection and timeout counts, the current and
+            maximum queue depth and the total and maximum call latency in seconds.
+        """
+
+        with self.__lock:
+            return dict(self.__stats, queue_depth=self.__depth)
+
+    def close(self) -> None:
+        """
+        Stop the hashing processes of the current process.
+        """
+
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+            owned = self.__executor_pid == os.getpid()
+            self.__executor_pid = None
+        if executor is not None and owned:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,4 +1,32 @@
+import datetime
+from typing import Any, Optional, Sequence
+
+# Column order of the Post constructor.
+POST_COLUMNS = (
+    "id, content, author, tags, createdAt, likesCount, dislikesCount, updatedAt"
+)
+
+
 class Post:
+    """
+    A post as stored in the posts table.
+
+    Posts are never modified once built; the serialized form returned by
+    post is computed on first use and shared by every later call.
+    """
+
+    __slots__ = (
+        "__id",
+        "__content",
+        "__author",
+        "__tags",
+        "__createdAt",
+        "__likesCount",
+        "__dislikesCount",
+        "__updatedAt",
+        "__serialized",
+    )
+
     def __init__(
         self,
         post_id: str,
@@ -8,6 +36,7 @@ class Post:
         createdAt: str,
         likesCount: int = 0,
         dislikesCount: int = 0,
+        updatedAt: Optional[datetime.datetime] = None,
     ):
 
         if len(content) > 1000 or len(tags) > 20:
@@ -20,18 +49,37 @@ class Post:
         self.__dislikesCount = dislikesCount
         self.__id = post_id
         self.__createdAt = createdAt
+        self.__updatedAt = updatedAt
+        self.__serialized: Optional[dict] = None
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "Post":
+        """
+        Build a post from a row selected with POST_COLUMNS.
+
+        Args:
+            row (Sequence[Any]): The id, content, author, tags, createdAt,
+                likesCount, dislikesCount and updatedAt columns.
+
+        Returns:
+            Post: The post.
+        """
+
+        return cls(*row)
 
     @property
     def post(self) -> dict:
-        return {
-            "id": self.__id,
-            "content": self.__content,
-            "author": self.__author,
-            "tags": self.__tags,
-            "createdAt": self.__createdAt,
-            "likesCount": self.__likesCount,
-            "dislikesCount": self.__dislikesCount,
-        }
+        if self.__serialized is None:
+            self.__serialized = {
+                "id": self.__id,
+                "content": self.__content,
+                "author": self.__author,
+                "tags": self.__tags,
+                "createdAt": self.__createdAt,
+                "likesCount": self.__likesCount,
+                "dislikesCount": self.__dislikesCount,
+            }
+        return self.__serialized
 
     @property
     def post_id(self) -> str:
@@ -53,6 +101,10 @@ class Post:
     def createdAt(self) -> str:
         return self.__createdAt
 
+    @property
+    def updatedAt(self) -> Optional[datetime.datetime]:
+        return self.__updatedAt
+
     @property
     def likesCount(self) -> int:
         return self.__likesCount
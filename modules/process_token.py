@@ -1,3 +1,4 @@
+import time
 import jwt
 from ..database.user_database import UserPostgreClient
 from ..modules.user import User
@@ -32,6 +33,14 @@ class TokenClient:
         """
         Validate the token.
 
+        Successful validations are cached on the token signature in the user
+        database's principal cache, so repeated requests skip the JWT decode
+        and the user lookup. Updates made through this process drop the cached
+        users of the login at once; updates made through other workers are
+        caught by comparing updatedAt with the database, which is done at most
+        once every principal_check_interval seconds per cached token. A password
+        change elsewhere thus takes up to that long to revoke old tokens here.
+
         Args:
             token (str): The token to validate.
 
@@ -39,6 +48,18 @@ class TokenClient:
             Optional[User]: The user object if the token is valid, otherwise None.
         """
 
+        signature = token.rsplit(".", 1)[-1]
+        cached = self.user_database.principal_cache.get(signature)
+        if cached is not None and cached[0] == token:
+            user, checked_at = cached[1], cached[2]
+            now = time.monotonic()
+            if now - checked_at < self.user_database.principal_check_interval:
+                return user
+            if self.user_database.get_user_version(user.login) == user.updatedAt:
+                cached[2] = now
+                return user
+            self.user_database.principal_cache.invalidate_tag(user.login)
+
         try:
             decoded_token = jwt.decode(token, "secret", algorithms=["HS256"])
             login = decoded_token.get("login")
@@ -61,4 +82,11 @@ class TokenClient:
         if password != user.password:
             return None
 
+        # [token, user, time.monotonic() of the last version check]
+        self.user_database.principal_cache.put(
+            signature,
+            [token, user, time.monotonic()],
+            tag=login,
+            expires_at=decoded_token.get("exp"),
+        )
         return user
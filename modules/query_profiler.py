@@ -0,0 +1,269 @@
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from flask import Response, request
+from ..database.connection_pool import PostgresConnectionPool
+from ..database.traced_cursor import add_query_listener, remove_query_listener
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecord:
+    """
+    One statement run on a TracedCursor.
+    """
+
+    def __init__(self, query: str, params: Any, seconds: float, rows: int) -> None:
+        self.query = query
+        self.params = params
+        self.seconds = seconds
+        self.rows = rows  # -1 when unknown, e.g. for server-side cursors
+        self.plan: Optional[str] = None
+
+
+class QueryLog:
+    """
+    The statements run on one thread while a QueryLog is active.
+    """
+
+    def __init__(self) -> None:
+        self.records: List[QueryRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def seconds(self) -> float:
+        return sum(record.seconds for record in self.records)
+
+    def repeated(self, threshold: int = 3) -> Dict[str, int]:
+        """
+        Find statements run at least threshold times, the usual sign of an N+1 pattern.
+
+        Args:
+            threshold (int): The minimum number of runs to report.
+
+        Returns:
+            Dict[str, int]: Normalized statement -> number of runs.
+        """
+
+        counts: Dict[str, int] = {}
+        for record in self.records:
+            key = _normalize(record.query)
+            counts[key] = counts.get(key, 0) + 1
+        return {query: count for query, count in counts.items() if count >= threshold}
+
+
+def _normalize(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip()
+
+
+_local = threading.local()
+_active = 0  # QueryLogs open on any thread; the listener is installed while > 0
+_active_lock = threading.Lock()
+
+
+def _record(query: str, params: Any, seconds: float, cursor: Any) -> None:
+    logs = getattr(_local, "logs", None)
+    if logs:
+        record = QueryRecord(query, params, seconds, cursor.rowcount)
+        for log in logs:
+            log.records.append(record)
+
+
+def _begin() -> QueryLog:
+    global _active
+
+    log = QueryLog()
+    if getattr(_local, "logs", None) is None:
+        _local.logs = []
+    _local.logs.append(log)
+    with _active_lock:
+        _active += 1
+        if _active == 1:
+            add_query_listener(_record)
+    return log
+
+
+def _end(log: QueryLog) -> None:
+    global _active
+
+    _local.logs.remove(log)
+    with _active_lock:
+        _active -= 1
+        if _active == 0:
+            remove_query_listener(_record)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """
+    Record the statements run on the current thread inside the block.
+
+    Example:
+        with count_queries() as queries:
+            client.get("/api/posts/feed/my")
+        assert len(queries) <= 4
+
+    Yields:
+        QueryLog: The statements, filled in as they run.
+    """
+
+    log = _begin()
+    try:
+        yield log
+    finally:
+        _end(log)
+
+
+class QueryProfiler:
+    """
+    A debugging aid that records every statement of a request.
+
+    It reports them in an X-Query-Profile header and the log, warns when a
+    request exceeds its round-trip budget or repeats a statement, and captures
+    EXPLAIN ANALYZE plans of slow statements.
+    """
+
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        budget: int = 10,
+        slow_ms: float = 100.0,
+        repeat_threshold: int = 3,
+        explain: bool = True,
+        header: bool = True,
+    ) -> None:
+        """
+        Initialize the QueryProfiler.
+
+        Args:
+            pool (PostgresConnectionPool): The pool EXPLAIN connections are taken from.
+            budget (int): The number of round trips a request may make without a warning.
+            slow_ms (float): Statements slower than this are explained.
+            repeat_threshold (int): Statements run this many times are reported as N+1.
+            explain (bool): Whether to capture EXPLAIN ANALYZE plans of slow statements.
+            header (bool): Whether to add the X-Query-Profile response header.
+        """
+
+        self.pool = pool
+        self.budget = budget
+        self.slow_ms = slow_ms
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+        self.header = header
+
+        self.__local = threading.local()
+
+    def start(self) -> None:
+        """
+        Start recording the current request; registered with app.before_request.
+        """
+
+        if getattr(self.__local, "log", None) is not None:
+            _end(self.__local.log)  # the previous request never reached finish
+        self.__local.log = _begin()
+        self.__local.started = time.perf_counter()
+
+    def finish(self, response: Response) -> Response:
+        """
+        Report the current request; registered with app.after_request.
+
+        Args:
+            response (Response): The response about to be sent.
+
+        Returns:
+            Response: The same response, with the X-Query-Profile header if enabled.
+        """
+
+        log: Optional[QueryLog] = getattr(self.__local, "log", None)
+        if log is None:
+            return response
+
+        self.__local.log = None
+        _end(log)  # before EXPLAIN, which runs queries of its own
+
+        endpoint = request.endpoint or request.path
+        slow = [
+            record for record in log.records if record.seconds * 1000 >= self.slow_ms
+        ]
+        repeated = log.repeated(self.repeat_threshold)
+
+        if self.explain:
+            for record in slow:
+                record.plan = self.__explain(record)
+
+        if self.header:
+            response.headers["X-Query-Profile"] = (
+                "queries={}; db_ms={:.1f}; total_ms={:.1f}; slow={}; repeated={}".format(
+                    len(log),
+                    log.seconds * 1000,
+                    (time.perf_counter() - self.__local.started) * 1000,
+                    len(slow),
+                    sum(repeated.values()),
+                )
+            )
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for record in log.records:
+                logger.debug(
+                    "%s %.1fms rows=%d %s",
+                    endpoint,
+                    record.seconds * 1000,
+                    record.rows,
+                    _normalize(record.query),
+                )
+
+        if len(log) > self.budget:
+            logger.warning(
+                "%s made %d round trips, over the budget of %d",
+                endpoint,
+                len(log),
+                self.budget,
+            )
+        for query, count in repeated.items():
+            logger.warning(
+                "%s ran the same statement %d times: %s", endpoint, count, query
+            )
+        for record in slow:
+            logger.warning(
+                "%s slow statement (%.1fms): %s\n%s",
+                endpoint,
+                record.seconds * 1000,
+                _normalize(record.query),
+                record.plan or "",
+            )
+
+        return response
+
+    def __explain(self, record: QueryRecord) -> Optional[str]:
+        # Only plain reads are re-run with ANALYZE; writes get an estimated plan.
+        query = record.query.strip().rstrip(";")
+        analyze = re.match(r"(?is)^select\b", query) and not re.search(
+            r"(?i)\bfor\s+update\b", query
+        )
+
+        try:
+            conn = self.pool.getconn()
+        except:
+            return None
+
+        # Keep the EXPLAIN statements out of any count_queries block on this thread.
+        logs, _local.logs = getattr(_local, "logs", None), []
+        try:
+            cur = conn.cursor()
+            cur.execute("SET LOCAL statement_timeout = %s", (int(self.slow_ms * 10),))
+            cur.execute(
+                "EXPLAIN {}{}".format("ANALYZE " if analyze else "", query),
+                record.params,
+            )
+            return "\n".join(row[0] for row in cur.fetchall())
+        except Exception as e:
+            return "EXPLAIN failed: {}".format(e)
+        finally:
+            _local.logs = logs
+            # putconn rolls back, so whatever EXPLAIN ANALYZE ran is discarded.
+            self.pool.putconn(conn)
@@ -0,0 +1,129 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..database.posts_database import PostPostgreClient
+
+
+class TagCounter:
+    """
+    In-memory counts of the tags on public users' recent posts, for trending tags.
+
+    Counts are kept per time bucket over a sliding window, with a running total
+    so top() never has to add the buckets up. Each process sees only the posts
+    written through it, so the counts are reloaded from the database every ttl
+    seconds to pick up the posts of the other workers.
+    """
+
+    def __init__(
+        self,
+        post_database: PostPostgreClient,
+        window: float = 86400.0,
+        bucket: float = 3600.0,
+        ttl: float = 300.0,
+    ) -> None:
+        """
+        Load the counts of the current window from the database.
+
+        Args:
+            post_database (PostPostgreClient): The post database object.
+            window (float): Seconds a post keeps counting towards its tags.
+            bucket (float): The width of a time bucket in seconds; counts expire
+                one bucket at a time.
+            ttl (float): Seconds after which the counts are reloaded on access;
+                0 disables reloading.
+        """
+
+        self.post_database = post_database
+        self.window = window
+        self.bucket = bucket
+        self.ttl = ttl
+
+        self.__lock = threading.Lock()
+        self.__reload_lock = threading.Lock()
+        self.__buckets: Dict[int, Counter] = {}
+        self.__totals: Counter = Counter()
+        self.__loaded_at = 0.0
+        self.reload()
+
+    def __slot(self, at: Optional[float] = None) -> int:
+        return int((time.time() if at is None else at) // self.bucket)
+
+    def __expire(self, now: int) -> None:
+        # Must be called with the lock held.
+        oldest = now - int(self.window // self.bucket)
+        for slot in [slot for slot in self.__buckets if slot <= oldest]:
+            counts = self.__buckets.pop(slot)
+            self.__totals.subtract(counts)
+            for tag in counts:
+                if self.__totals[tag] <= 0:
+                    del self.__totals[tag]
+
+    def reload(self) -> None:
+        """
+        Replace the counts with those computed by the database.
+        """
+
+        with self.__reload_lock:
+            self.__load()
+
+    def __load(self) -> None:
+        rows = self.post_database.count_recent_tags(self.window, self.bucket)
+        buckets: Dict[int, Counter] = {}
+        totals: Counter = Counter()
+        for tag, slot, count in rows:
+            buckets.setdefault(slot, Counter())[tag] += count
+            totals[tag] += count
+
+        with self.__lock:
+            self.__buckets = buckets
+            self.__totals = totals
+            self.__loaded_at = time.monotonic()
+            self.__expire(self.__slot())
+
+    def __maybe_reload(self) -> None:
+        if not self.ttl or time.monotonic() - self.__loaded_at <= self.ttl:
+            return
+        # Only one thread reloads; the others keep answering from the old counts.
+        if self.__reload_lock.acquire(blocking=False):
+            try:
+                self.__load()
+            except:
+                self.__loaded_at = time.monotonic()  # retry after another ttl
+            finally:
+                self.__reload_lock.release()
+
+    def add(self, tags: Iterable[str], at: Optional[float] = None) -> None:
+        """
+        Count the tags of a new post.
+
+        Args:
+            tags (Iterable[str]): The tags of the post; repeated tags count once.
+            at (Optional[float]): The Unix time the post was created; defaults to now.
+        """
+
+        slot = self.__slot(at)
+        with self.__lock:
+            counts = self.__buckets.setdefault(slot, Counter())
+            for tag in set(tags):
+                counts[tag] += 1
+                self.__totals[tag] += 1
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Retrieve the most used tags of the window.
+
+        Args:
+            limit (int): The number of tags to return.
+
+        Returns:
+            List[Tuple[str, int]]: (tag, posts) pairs, most used first, ties by tag.
+        """
+
+        self.__maybe_reload()
+        with self.__lock:
+            self.__expire(self.__slot())
+            return heapq.nsmallest(
+                limit, self.__totals.items(), key=lambda item: (-item[1], item[0])
+            )
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Entries may carry a tag (for example a user login) so that every entry
+    derived from the same record can be dropped at once with invalidate_tag.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0) -> None:
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size (int): The maximum number of entries; 0 disables the cache.
+            ttl (float): Seconds an entry stays valid after it is stored.
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.__tags: Dict[Hashable, Set[Hashable]] = {}
+        self.__lock = threading.Lock()
+
+    def __drop(self, key: Hashable) -> None:
+        # Must be called with the lock held.
+        _, _, tag = self.__entries.pop(key)
+        if tag is not None:
+            keys = self.__tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.__tags[tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retrieve a live entry and mark it as recently used.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss.
+        """
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self.__drop(key)
+                self.misses += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        tag: Optional[Hashable] = None,
+        expires_at: Optional[float] = None,
+    ) -> None:
+        """
+        Store a value, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            tag (Optional[Hashable]): An optional tag used by invalidate_tag.
+            expires_at (Optional[float]): An optional UNIX timestamp after which the
+                entry must not be served, even if the TTL has not elapsed yet.
+        """
+
+        if self.max_size <= 0:
+            return
+
+        lifetime = self.ttl
+        if expires_at is not None:
+            lifetime = min(lifetime, expires_at - time.time())
+        if lifetime <= 0:
+            return
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__drop(key)
+
+            self.__entries[key] = (value, time.monotonic() + lifetime, tag)
+            if tag is not None:
+                self.__tags.setdefault(tag, set()).add(key)
+
+            while len(self.__entries) > self.max_size:
+                self.__drop(next(iter(self.__entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop a single entry if present.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__drop(key)
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """
+        Drop every entry stored with the given tag.
+
+        Args:
+            tag (Hashable): The tag passed to put.
+        """
+
+        with self.__lock:
+            for key in list(self.__tags.get(tag, ())):
+                self.__drop(key)
+
+    def clear(self) -> None:
+        """
+        Drop every entry.
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the cache counters.
+
+        Returns:
+            Dict[str, int]: Hit, miss and eviction counters and the current size.
+        """
+
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.__entries),
+            }
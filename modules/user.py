@@ -1,7 +1,28 @@
-from typing import Optional
+import datetime
+from typing import Any, Optional, Sequence
 
 
 class User:
+    """
+    A registered user.
+
+    Users are shared between requests through the principal cache and are not
+    modified once built; the profile returned by get_profile is computed on
+    first use and shared by every later call.
+    """
+
+    __slots__ = (
+        "login",
+        "email",
+        "password",
+        "countryCode",
+        "isPublic",
+        "phone",
+        "image",
+        "updatedAt",
+        "__profile",
+    )
+
     def __init__(
         self,
         login: str,
@@ -11,6 +32,7 @@ class User:
         isPublic: bool,
         phone: Optional[str] = None,
         image: Optional[str] = None,
+        updatedAt: Optional[datetime.datetime] = None,
     ):
 
         self.login = login
@@ -20,8 +42,28 @@ class User:
         self.isPublic = isPublic
         self.phone = phone
         self.image = image
+        self.updatedAt = updatedAt
+        self.__profile: Optional[dict] = None
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "User":
+        """
+        Build a user from a row selected with USER_COLUMNS.
+
+        Args:
+            row (Sequence[Any]): The login, email, password, countryCode, isPublic,
+                phone, image and updatedAt columns.
+
+        Returns:
+            User: The user.
+        """
+
+        return cls(*row)
 
     def get_profile(self) -> dict:
+        if self.__profile is not None:
+            return self.__profile
+
         user: dict = {
             "login": self.login,
             "email": self.email,
@@ -35,4 +77,5 @@ class User:
         if self.image is not None:
             user["image"] = self.image
 
+        self.__profile = user
         return user
@@ -1,20 +1,20 @@
 from flask import Blueprint, jsonify, request, Response, Request
 import re
-import bcrypt
 from psycopg2.errors import UniqueViolation
 from typing import Any, Optional
 from ...modules.user import User
+from ...modules.password_hasher import HashingUnavailableError
 from ...database.user_database import UserPostgreClient
-from ...database.countries_database import CountryPostgreClient
+from ...modules.country_catalog import CountryCatalog
 
 
 class RegisterRoute:
     def __init__(
-        self, user_database: UserPostgreClient, country_database: CountryPostgreClient
+        self, user_database: UserPostgreClient, country_catalog: CountryCatalog
     ) -> None:
         self.blueprint = Blueprint("register", __name__)
         self.user_database = user_database
-        self.country_database = country_database
+        self.country_catalog = country_catalog
 
         @self.blueprint.route("/api/auth/register", methods=["POST"])
         def register() -> tuple[Response, int]:
@@ -27,17 +27,33 @@ class RegisterRoute:
 
         user_data = request.json
         required_fields = ["login", "email", "password", "countryCode", "isPublic"]
+        optional_fields = ["phone", "image"]
         if not all(field in user_data for field in required_fields):
             return jsonify({"reason": "Missing fields"}), 400
 
         try:
-            user = User(**user_data)
+            # Only the registration fields; anything else, such as updatedAt,
+            # is set by the database.
+            user = User(
+                **{
+                    field: user_data[field]
+                    for field in required_fields + optional_fields
+                    if field in user_data
+                }
+            )
         except:
             return jsonify({"reason": "Bad user data"}), 400
 
         if not self.user_database.check_password(user.password):
             return jsonify({"reason": "Bad password"}), 400
 
+        if not self.country_catalog.has_country(user.countryCode):
+            return jsonify({"reason": "Country not found"}), 400
+
+        # Reject duplicates before add_user pays for bcrypt.
+        if self.user_database.identity_exists(user):
+            return jsonify({"reason": "User already exists"}), 409
+
         result = {
             "profile": user.get_profile(),
         }
@@ -46,6 +62,8 @@ class RegisterRoute:
             self.user_database.add_user(user)
         except UniqueViolation:
             return jsonify({"reason": "User already exists"}), 409
+        except HashingUnavailableError:
+            return jsonify({"reason": "Server is busy"}), 503
         except:
             return jsonify({"reason": "Failed to register user"}), 400
 
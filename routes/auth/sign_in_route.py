@@ -2,16 +2,19 @@ from flask import Blueprint, jsonify, Response, request, Request
 from typing import Optional, Any
 import jwt
 import datetime
-import bcrypt
 from ...database.user_database import UserPostgreClient
+from ...modules.password_hasher import PasswordHasher, HashingUnavailableError
 
 import time
 
 
 class SignInRoute:
-    def __init__(self, user_database: UserPostgreClient) -> None:
+    def __init__(
+        self, user_database: UserPostgreClient, password_hasher: PasswordHasher
+    ) -> None:
         self.blueprint = Blueprint("login", __name__)
         self.user_database = user_database
+        self.password_hasher = password_hasher
 
         @self.blueprint.route("/api/auth/sign-in/", methods=["POST"])
         def sign_in() -> tuple[Response, int]:
@@ -38,8 +41,11 @@ class SignInRoute:
         if user is None:
             return jsonify({"reason": "User not registered"}), 401
 
-        if not bcrypt.checkpw(password.encode("utf-8"), user.password.encode("utf-8")):
-            return jsonify({"reason": "Incorrect password"}), 401
+        try:
+            if not self.password_hasher.verify(password, user.password):
+                return jsonify({"reason": "Incorrect password"}), 401
+        except HashingUnavailableError:
+            return jsonify({"reason": "Server is busy"}), 503
 
         token: str = jwt.encode(
             {
@@ -1,18 +1,19 @@
 from flask import Blueprint, jsonify, Response, request
-import psycopg2
-from typing import Any, Optional
+from typing import Optional
+from ..modules.country_catalog import CountryCatalog
+from ..modules.http_cache import is_fresh, not_modified, with_validators
 
 
 class CountryRoute:
-    def __init__(self, country_database: Any) -> None:
+    def __init__(self, country_catalog: CountryCatalog) -> None:
         """
-        Initialize the CountryRoute with the given country_database.
+        Initialize the CountryRoute with the given country_catalog.
 
         Args:
-            country_database (Any): The country database object.
+            country_catalog (CountryCatalog): The in-memory country catalog.
         """
 
-        self.country_database = country_database
+        self.country_catalog = country_catalog
 
         self.blueprint = Blueprint("countries", __name__)
 
@@ -47,7 +48,7 @@ class CountryRoute:
     # First Part
     def __get_countries(self, filter_region: Optional[list]) -> tuple[Response, int]:
         """
-        Retrieve a list of countries from the database based on the filter_region.
+        Retrieve a list of countries from the catalog based on the filter_region.
 
         Args:
             filter_region (Optional[list]): The optional list of regions to filter the countries.
@@ -56,58 +57,44 @@ class CountryRoute:
             tuple[Response, int]: The countries data and HTTP status code.
         """
 
-        country_data = self.__fetch_countries_from_db(filter_region)
-        if country_data is None:
+        body = self.country_catalog.regions_json(filter_region or [])
+        if body is None:
             return jsonify({"reason": "Bad data"}), 400
 
-        countries = [
-            {
-                "name": row[0],
-                "alpha2": row[1],
-                "alpha3": row[2],
-                "region": row[3],
-            }
-            for row in country_data
-        ]
+        return self.__respond(body)
 
-        return jsonify(countries), 200
-
-    def __fetch_countries_from_db(self, filter_region: Optional[list]) -> Any:
+    # Second Part
+    def __get_country(self, alpha2: str) -> tuple[Response, int]:
         """
-        Fetch countries from the database based on the filter_region.
+        Retrieve a specific country from the catalog based on the alpha2 code.
 
         Args:
-            filter_region (Optional[list]): The optional list of regions to filter the countries.
+            alpha2 (str): The alpha2 code of the country.
 
         Returns:
-            Any: The fetched country data.
+            tuple[Response, int]: The country data and HTTP status code.
         """
 
-        if filter_region is None:
-            return self.country_database.filter_region(filter_region)
+        body = self.country_catalog.country_json(alpha2)
 
-        regions = [i[-1] for i in self.country_database.filter_region(filter_region)]
-        if len(filter_region) != len(set(regions)):
-            return None
+        if body is None:
+            return jsonify({"reason": "Country not found"}), 404
 
-        return self.country_database.filter_region(filter_region)
+        return self.__respond(body)
 
-    # Second Part
-    def __get_country(self, alpha2: str) -> tuple[Response, int]:
+    def __respond(self, body: bytes) -> tuple[Response, int]:
         """
-        Retrieve a specific country from the database based on the alpha2 code.
+        Send a catalog body, or 304 if the client already has it.
 
         Args:
-            alpha2 (str): The alpha2 code of the country.
+            body (bytes): The serialized JSON body.
 
         Returns:
-            tuple[Response, int]: The country data and HTTP status code.
+            tuple[Response, int]: The response and HTTP status code.
         """
 
-        row = self.country_database.get_country_by_alpha(alpha2)
-
-        if not row:
-            return jsonify({"reason": "Country not found"}), 404
+        etag = self.country_catalog.etag(body)
+        if is_fresh(request, etag):
+            return not_modified(etag), 304
 
-        country = {"name": row[0], "alpha2": row[1], "alpha3": row[2], "region": row[3]}
-        return jsonify(country), 200
+        return with_validators(Response(body, mimetype="application/json"), etag), 200
@@ -1,17 +1,23 @@
-from flask import Blueprint, jsonify, Response, request, Request
+from functools import partial
+from flask import Blueprint, jsonify, Response, request, Request, current_app
 from ...modules.user import User
 from ...database.user_database import UserPostgreClient
 from ...database.friend_database import FriendsPostgreClient
 from ...modules.process_token import TokenClient
+from ...modules.json_stream import json_array
 
 
 class ListFriendRoute:
     def __init__(
-        self, user_database: UserPostgreClient, friend_database: FriendsPostgreClient
+        self,
+        user_database: UserPostgreClient,
+        friend_database: FriendsPostgreClient,
+        rendering: str = "python",
     ) -> None:
 
         self.user_database = user_database
         self.friend_database = friend_database
+        self.rendering = rendering  # "python", "sql" or "stream"
         self.token_processing = TokenClient(self.user_database)
         self.blueprint = Blueprint("list_friend", __name__)
 
@@ -34,7 +40,32 @@ class ListFriendRoute:
         if user is None:
             return jsonify({"reason": "Invalid token"}), 401
 
-        friends = self.friend_database.get_user_friends(user.login)[
-            offset : offset + limit
-        ]
-        return jsonify(friends), 200
+        try:
+            if self.rendering == "sql":
+                body, next_cursor = self.friend_database.get_user_friends_json(
+                    user.login, limit, offset, request.args.get("cursor")
+                )
+                response = Response(body + "\n", mimetype="application/json")
+            elif self.rendering == "stream":
+                chunks, next_cursor = self.friend_database.stream_user_friends(
+                    user.login, limit, offset, request.args.get("cursor")
+                )
+                response = Response(
+                    json_array(
+                        chunks,
+                        partial(current_app.json.dumps, separators=(",", ":")),
+                        end="]\n",
+                    ),
+                    mimetype="application/json",
+                )
+            else:
+                friends, next_cursor = self.friend_database.get_user_friends(
+                    user.login, limit, offset, request.args.get("cursor")
+                )
+                response = jsonify(friends)
+        except ValueError:
+            return jsonify({"reason": "Invalid cursor"}), 400
+
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
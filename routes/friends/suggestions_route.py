@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify, Response, request, Request
+from ...database.user_database import UserPostgreClient
+from ...database.friend_database import FriendsPostgreClient
+from ...modules.process_token import TokenClient
+
+
+class SuggestFriendsRoute:
+    def __init__(
+        self, user_database: UserPostgreClient, friend_database: FriendsPostgreClient
+    ) -> None:
+
+        self.user_database = user_database
+        self.friend_database = friend_database
+        self.token_processing = TokenClient(self.user_database)
+        self.blueprint = Blueprint("suggest_friends", __name__)
+
+        @self.blueprint.route("/api/friends/suggestions", methods=["GET"])
+        def suggest_friends() -> tuple[Response, int]:
+            return self.__suggest_friends(request)
+
+    def __suggest_friends(self, request: Request) -> tuple[Response, int]:
+        token = self.token_processing.get_token(request)
+        limit = request.args.get("limit", 10, int)
+
+        if limit > 50 or limit < 0:
+            return jsonify({"reason": "Invalid limit"}), 401
+
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        user = self.token_processing.validate_token(token)
+        if user is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        return jsonify(self.friend_database.suggest_friends(user.login, limit)), 200
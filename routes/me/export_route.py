@@ -0,0 +1,74 @@
+from flask import Blueprint, jsonify, Response, request, Request, current_app
+from functools import partial
+from typing import Iterator
+from ...database.user_database import UserPostgreClient
+from ...database.friend_database import FriendsPostgreClient
+from ...database.posts_database import PostPostgreClient
+from ...modules.process_token import TokenClient
+from ...modules.json_stream import json_array
+
+
+class ExportRoute:
+    def __init__(
+        self,
+        user_database: UserPostgreClient,
+        friend_database: FriendsPostgreClient,
+        post_database: PostPostgreClient,
+    ) -> None:
+        """
+        Initialize the ExportRoute with the given databases.
+
+        Args:
+            user_database (UserPostgreClient): The user database object.
+            friend_database (FriendsPostgreClient): The friend database object.
+            post_database (PostPostgreClient): The post database object.
+        """
+
+        self.user_database = user_database
+        self.friend_database = friend_database
+        self.post_database = post_database
+        self.token_processing = TokenClient(self.user_database)
+        self.blueprint = Blueprint("export", __name__)
+
+        @self.blueprint.route("/api/me/export", methods=["GET"])
+        def export() -> tuple[Response, int]:
+            """
+            Export the profile, every friend and every post of the current user.
+
+            Returns:
+                tuple[Response, int]: The streamed export and HTTP status code.
+            """
+            return self.__export(request)
+
+    def __export(self, request: Request) -> tuple[Response, int]:
+        """
+        Stream the full history of the current user as one JSON document.
+
+        Friends and posts are read from server-side cursors, so the memory used
+        does not grow with the size of the history.
+
+        Returns:
+            tuple[Response, int]: The streamed export and HTTP status code.
+        """
+        token = self.token_processing.get_token(request)
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        user = self.token_processing.validate_token(token)
+        if user is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        dumps = partial(current_app.json.dumps, separators=(",", ":"))
+        friends, _ = self.friend_database.stream_user_friends(user.login)
+        posts, _ = self.post_database.stream_posts_by_user(user.login)
+
+        def body() -> Iterator[str]:
+            yield '{"friends":'
+            yield from json_array(friends, dumps)
+            yield ',"posts":'
+            yield from json_array(posts, dumps)
+            yield ',"profile":' + dumps(user.get_profile()) + "}\n"
+
+        response = Response(body(), mimetype="application/json")
+        response.headers["Content-Disposition"] = "attachment; filename=export.json"
+        return response, 200
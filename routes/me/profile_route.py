@@ -1,22 +1,24 @@
 from flask import Blueprint, jsonify, Response, request, Request
 from ...database.user_database import UserPostgreClient
-from ...database.countries_database import CountryPostgreClient
+from ...modules.country_catalog import CountryCatalog
 from ...modules.process_token import TokenClient
+from ...modules.http_cache import make_etag, is_fresh, not_modified, with_validators
 
 
 class ProfileRoute:
     def __init__(
-        self, user_database: UserPostgreClient, country_database: CountryPostgreClient
+        self, user_database: UserPostgreClient, country_catalog: CountryCatalog
     ) -> None:
         """
         Initialize the ProfileRoute with the given user_database.
 
         Args:
             user_database (Any): The user database object.
+            country_catalog (CountryCatalog): The in-memory country catalog.
         """
 
         self.user_database = user_database
-        self.country_database = country_database
+        self.country_catalog = country_catalog
         self.token_processing = TokenClient(self.user_database)
         self.blueprint = Blueprint("profile", __name__)
 
@@ -55,7 +57,12 @@ class ProfileRoute:
         if user is None:
             return jsonify({"reason": "Invalid token"}), 401
 
-        return jsonify(user.get_profile()), 200
+        # A cached user was just checked against updatedAt, so a 304 needs no other query.
+        etag = make_etag("user", user.login, user.updatedAt)
+        if is_fresh(request, etag, user.updatedAt):
+            return not_modified(etag, user.updatedAt), 304
+
+        return with_validators(jsonify(user.get_profile()), etag, user.updatedAt), 200
 
     def __patch_profile(self, request: Request) -> tuple[Response, int]:
         """
@@ -79,6 +86,11 @@ class ProfileRoute:
         if set(data.keys()) & set(not_allowed_fields):
             return jsonify({"reason": "Bad data"}), 401
 
+        if "countryCode" in data and not self.country_catalog.has_country(
+            data["countryCode"]
+        ):
+            return jsonify({"reason": "Not allowed fields or not valid data"}), 400
+
         err = self.user_database.update_user_data(user.login, data)
         if err != 200:
             return jsonify({"reason": "Not allowed fields or not valid data"}), err
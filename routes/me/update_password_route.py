@@ -1,20 +1,23 @@
 from flask import Blueprint, jsonify, Response, request, Request
 from ...database.user_database import UserPostgreClient
-from ...database.countries_database import CountryPostgreClient
 from ...modules.process_token import TokenClient
-import bcrypt
+from ...modules.password_hasher import PasswordHasher, HashingUnavailableError
 
 
 class UpdatePasswordRoute:
-    def __init__(self, user_database: UserPostgreClient) -> None:
+    def __init__(
+        self, user_database: UserPostgreClient, password_hasher: PasswordHasher
+    ) -> None:
         """
         Initialize the ProfileRoute with the given user_database.
 
         Args:
             user_database (Any): The user database object.
+            password_hasher (PasswordHasher): The bcrypt hashing service.
         """
 
         self.user_database = user_database
+        self.password_hasher = password_hasher
         self.token_processing = TokenClient(self.user_database)
         self.blueprint = Blueprint("update_password", __name__)
 
@@ -43,12 +46,13 @@ class UpdatePasswordRoute:
         if not self.user_database.check_password(data["newPassword"]):
             return jsonify({"reason": "Password not valid"}), 400
 
-        if not bcrypt.checkpw(
-            data["oldPassword"].encode("utf-8"), user.password.encode("utf-8")
-        ):
-            return jsonify({"reason": "Incorrect password"}), 403
+        try:
+            if not self.password_hasher.verify(data["oldPassword"], user.password):
+                return jsonify({"reason": "Incorrect password"}), 403
 
-        err = self.user_database.change_password(user.login, data["newPassword"])
+            err = self.user_database.change_password(user.login, data["newPassword"])
+        except HashingUnavailableError:
+            return jsonify({"reason": "Server is busy"}), 503
         if err != 200:
             return jsonify({"reason": "Not allowed fields or not valid data"}), err
 
@@ -0,0 +1,24 @@
+from flask import Blueprint, Response
+from ..modules.metrics import render
+
+
+class MetricsRoute:
+    def __init__(self) -> None:
+        """
+        Initializes the MetricsRoute class.
+        """
+
+        self.blueprint = Blueprint("metrics", __name__)
+
+        @self.blueprint.route("/api/metrics", methods=["GET"])
+        def metrics() -> tuple[Response, int]:
+            """
+            Handles the GET request to /api/metrics endpoint.
+
+            Returns:
+                tuple[Response, int]: The metrics of every worker in the Prometheus
+                text format and the status code.
+            """
+
+            body, content_type = render()
+            return Response(body, content_type=content_type), 200
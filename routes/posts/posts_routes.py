@@ -2,10 +2,17 @@ from ...database.posts_database import PostPostgreClient
 from ...database.user_database import UserPostgreClient
 from ...database.friend_database import FriendsPostgreClient
 from ...database.reactions_database import ReactionPostgreClient
+from ...database.reaction_buffer import ReactionBufferFullError
+from ...database.timeline_database import TimelinePostgreClient
 
 
-from flask import Blueprint, Response, request, jsonify, Request
+from flask import Blueprint, Response, request, jsonify, Request, current_app
+from typing import Optional
+from functools import partial
 from ...modules.process_token import TokenClient
+from ...modules.json_stream import json_array
+from ...modules.tag_counter import TagCounter
+from ...modules.http_cache import make_etag, is_fresh, not_modified, with_validators
 
 
 class PostsRoute:
@@ -15,11 +22,17 @@ class PostsRoute:
         user_database: UserPostgreClient,
         friend_database: FriendsPostgreClient,
         reaction_database: ReactionPostgreClient,
+        rendering: str = "python",
+        timeline_database: Optional[TimelinePostgreClient] = None,
+        tag_counter: Optional[TagCounter] = None,
     ) -> None:
         self.post_database = post_database
         self.user_database = user_database
         self.friend_database = friend_database
         self.reaction_database = reaction_database
+        self.rendering = rendering  # "python", "sql" or "stream"
+        self.timeline_database = timeline_database
+        self.tag_counter = tag_counter
 
         self.blueprint = Blueprint("new", __name__)
         self.token_processing = TokenClient(self.user_database)
@@ -32,6 +45,22 @@ class PostsRoute:
         def my_posts(login: str) -> tuple[Response, int]:
             return self.__get_posts(login=login, request=request)
 
+        @self.blueprint.route("/api/posts/home", methods=["GET"])
+        def home() -> tuple[Response, int]:
+            return self.__get_home(request)
+
+        @self.blueprint.route("/api/posts/tags/<tag>", methods=["GET"])
+        def by_tags(tag: str) -> tuple[Response, int]:
+            return self.__get_by_tags(request, [tag] + request.args.getlist("tag"))
+
+        @self.blueprint.route("/api/posts/search", methods=["GET"])
+        def search() -> tuple[Response, int]:
+            return self.__search(request)
+
+        @self.blueprint.route("/api/posts/trending-tags", methods=["GET"])
+        def trending_tags() -> tuple[Response, int]:
+            return self.__trending_tags(request)
+
         @self.blueprint.route("/api/posts/<post_id>", methods=["GET"])
         def get_by_id(post_id: str) -> tuple[Response, int]:
             return self.__get_by_id(request, post_id)
@@ -58,6 +87,9 @@ class PostsRoute:
         if new_post is None:
             return jsonify({"reason": "Bad data"}), 401
 
+        if self.tag_counter is not None and user.isPublic:
+            self.tag_counter.add(new_post.tags)
+
         return jsonify(new_post.post), 200
 
     def __get_by_id(self, request: Request, post_id: str) -> tuple[Response, int]:
@@ -80,16 +112,30 @@ class PostsRoute:
         if user_to is None:
             return jsonify({"reason": "User not found"}), 404
 
-        if user_to.isPublic:
-            return jsonify(post.post), 200
-        elif self.friend_database.is_friend_registered(user_to.login, user_from.login):
-            return jsonify(post.post), 200
-        return jsonify({"reason": "Post not found"}), 404
+        if not user_to.isPublic and not self.friend_database.is_friend(
+            user_to.login, user_from.login
+        ):
+            return jsonify({"reason": "Post not found"}), 404
+
+        # Buffered reactions change the counters without touching updatedAt, so
+        # with a buffer only the ETag, which covers the counters, is reliable.
+        post = self.reaction_database.apply_pending(post)
+        etag = make_etag(
+            "post", post.id, post.updatedAt, post.likesCount, post.dislikesCount
+        )
+        last_modified = (
+            post.updatedAt if self.reaction_database.buffer is None else None
+        )
+        if is_fresh(request, etag, last_modified):
+            return not_modified(etag, last_modified), 304
+
+        return with_validators(jsonify(post.post), etag, last_modified), 200
 
     def __get_posts(self, request: Request, login: str) -> tuple[Response, int]:
 
         limit = request.args.get("limit", 5, int)
         offset = request.args.get("offset", 0, int)
+        cursor = request.args.get("cursor")
 
         if limit > 50 or limit < 0 or offset < 0:
             return jsonify({"reason": "Invalid limit or offset"}), 401
@@ -104,15 +150,14 @@ class PostsRoute:
 
         match login:
             case "my":
-                posts = self.post_database.get_posts_by_user(user.login)
-                return jsonify(posts[offset : offset + limit]), 200
+                return self.__posts_page(user.login, limit, offset, cursor)
             case _:
                 requested_user = self.user_database.get_user_data(login)
                 if requested_user is None:
                     return jsonify({"reason": "User not found"}), 404
 
                 try:
-                    friend_registered = self.friend_database.is_friend_registered(
+                    friend_registered = self.friend_database.is_friend(
                         requested_user.login, user.login
                     )
                 except:
@@ -120,8 +165,164 @@ class PostsRoute:
 
                 if not requested_user.isPublic and not friend_registered:
                     return jsonify({"reason": "User not found"}), 404
-                posts = self.post_database.get_posts_by_user(requested_user.login)
-                return jsonify(posts[offset : offset + limit]), 200
+                return self.__posts_page(requested_user.login, limit, offset, cursor)
+
+    def __get_home(self, request: Request) -> tuple[Response, int]:
+
+        limit = request.args.get("limit", 5, int)
+        offset = request.args.get("offset", 0, int)
+        cursor = request.args.get("cursor")
+
+        if limit > 50 or limit < 0 or offset < 0:
+            return jsonify({"reason": "Invalid limit or offset"}), 401
+
+        token = self.token_processing.get_token(request)
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        user = self.token_processing.validate_token(token)
+        if user is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        if self.timeline_database is None:
+            return jsonify({"reason": "Home timeline is disabled"}), 404
+
+        try:
+            posts, next_cursor = self.timeline_database.get_home_timeline(
+                user.login, limit, offset, cursor
+            )
+        except ValueError:
+            return jsonify({"reason": "Invalid cursor"}), 400
+
+        response = jsonify(posts)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
+
+    def __get_by_tags(self, request: Request, tags: list[str]) -> tuple[Response, int]:
+
+        limit = request.args.get("limit", 5, int)
+        offset = request.args.get("offset", 0, int)
+        cursor = request.args.get("cursor")
+        match = request.args.get("match", "any")
+
+        if limit > 50 or limit < 0 or offset < 0:
+            return jsonify({"reason": "Invalid limit or offset"}), 401
+
+        if match not in ("any", "all") or len(tags) > 20 or not all(tags):
+            return jsonify({"reason": "Invalid tags"}), 400
+
+        token = self.token_processing.get_token(request)
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        user = self.token_processing.validate_token(token)
+        if user is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        try:
+            posts, next_cursor = self.post_database.get_posts_by_tags(
+                tags, user.login, match == "all", limit, offset, cursor
+            )
+        except ValueError:
+            return jsonify({"reason": "Invalid cursor"}), 400
+
+        response = jsonify(posts)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
+
+    def __search(self, request: Request) -> tuple[Response, int]:
+
+        limit = request.args.get("limit", 5, int)
+        offset = request.args.get("offset", 0, int)
+        cursor = request.args.get("cursor")
+        text = request.args.get("q", "")
+
+        if limit > 50 or limit < 0 or offset < 0:
+            return jsonify({"reason": "Invalid limit or offset"}), 401
+
+        if not text.strip() or len(text) > 200:
+            return jsonify({"reason": "Invalid search"}), 400
+
+        token = self.token_processing.get_token(request)
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        user = self.token_processing.validate_token(token)
+        if user is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        try:
+            posts, next_cursor = self.post_database.search_posts(
+                text, user.login, limit, offset, cursor
+            )
+        except ValueError:
+            return jsonify({"reason": "Invalid search or cursor"}), 400
+
+        response = jsonify(posts)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
+
+    def __trending_tags(self, request: Request) -> tuple[Response, int]:
+
+        limit = request.args.get("limit", 10, int)
+        if limit > 50 or limit < 0:
+            return jsonify({"reason": "Invalid limit"}), 401
+
+        token = self.token_processing.get_token(request)
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        if self.token_processing.validate_token(token) is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        if self.tag_counter is None:
+            return jsonify({"reason": "Trending tags are disabled"}), 404
+
+        return (
+            jsonify(
+                [
+                    {"tag": tag, "count": count}
+                    for tag, count in self.tag_counter.top(limit)
+                ]
+            ),
+            200,
+        )
+
+    def __posts_page(
+        self, login: str, limit: int, offset: int, cursor: Optional[str]
+    ) -> tuple[Response, int]:
+        try:
+            if self.rendering == "sql":
+                body, next_cursor = self.post_database.get_posts_by_user_json(
+                    login, limit, offset, cursor
+                )
+                response = Response(body + "\n", mimetype="application/json")
+            elif self.rendering == "stream":
+                chunks, next_cursor = self.post_database.stream_posts_by_user(
+                    login, limit, offset, cursor
+                )
+                response = Response(
+                    json_array(
+                        chunks,
+                        partial(current_app.json.dumps, separators=(",", ":")),
+                        end="]\n",
+                    ),
+                    mimetype="application/json",
+                )
+            else:
+                posts, next_cursor = self.post_database.get_posts_by_user(
+                    login, limit, offset, cursor
+                )
+                response = jsonify(posts)
+        except ValueError:
+            return jsonify({"reason": "Invalid cursor"}), 400
+
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
 
     def __reaction(
         self, request: Request, post_id: str, reaction: str
@@ -134,7 +335,7 @@ class PostsRoute:
         if user is None:
             return jsonify({"reason": "Invalid token"}), 401
 
-        post = self.post_database.get_post_by_id(post_id)
+        post, stored = self.reaction_database.get_post_for_reaction(post_id, user.login)
         if post is None:
             return jsonify({"reason": "Post not found"}), 404
 
@@ -142,7 +343,7 @@ class PostsRoute:
         if requested_user is None:
             return jsonify({"reason": "Post not found"}), 404
         try:
-            friend_registered = self.friend_database.is_friend_registered(
+            friend_registered = self.friend_database.is_friend(
                 requested_user.login, user.login
             )
         except:
@@ -151,21 +352,12 @@ class PostsRoute:
         if not requested_user.isPublic and not friend_registered:
             return jsonify({"reason": "Post not found"}), 404
 
-        self.reaction_database.add_reaction(post_id, user.login, reaction)
-        reactions_count = self.reaction_database.get_reaction_counts(post_id)
-
-        likes = reactions_count.get("likesCount")
-        dislikes = reactions_count.get("dislikesCount")
-        if likes is None:
-            return jsonify({"reason": "Post not found"}), 404
-        if dislikes is None:
-            return jsonify({"reason": "Post not found"}), 404
-
-        self.post_database.update_post(
-            post_id, {"likesCount": likes, "dislikesCount": dislikes}
-        )
-
-        final_post = self.post_database.get_post_by_id(post_id)
+        try:
+            final_post = self.reaction_database.react(
+                post, user.login, reaction, stored
+            )
+        except ReactionBufferFullError:
+            return jsonify({"reason": "Server is busy"}), 503
         if final_post is None:
             return jsonify({"reason": "Post not found"}), 404
         return jsonify(final_post.post), 200
@@ -1,8 +1,10 @@
 from flask import Blueprint, jsonify, Response, request, Request
+import re
 from ..modules.user import User
 from ..database.user_database import UserPostgreClient
 from ..database.countries_database import CountryPostgreClient
 from ..modules.process_token import TokenClient
+from ..modules.http_cache import make_etag, is_fresh, not_modified, with_validators
 
 
 class ProfilesRoute:
@@ -12,6 +14,16 @@ class ProfilesRoute:
         self.token_processing = TokenClient(self.user_database)
         self.blueprint = Blueprint("profiles", __name__)
 
+        @self.blueprint.route("/api/profiles", methods=["GET"])
+        def search_profiles() -> tuple[Response, int]:
+            """
+            Autocomplete the logins of public users from the prefix query parameter.
+
+            Returns:
+                tuple[Response, int]: The matching logins and HTTP status code.
+            """
+            return self.__search_profiles(request)
+
         @self.blueprint.route("/api/profiles/<login>", methods=["GET"])
         def get_profile_by_login(login: str) -> tuple[Response, int]:
             """
@@ -50,4 +62,36 @@ class ProfilesRoute:
             return jsonify({"reason": "User not found"}), 403
         if not user.isPublic:
             return jsonify({"reason": "User not found"}), 403
-        return jsonify(user.get_profile()), 200
+
+        etag = make_etag("user", user.login, user.updatedAt)
+        if is_fresh(request, etag, user.updatedAt):
+            return not_modified(etag, user.updatedAt), 304
+
+        return with_validators(jsonify(user.get_profile()), etag, user.updatedAt), 200
+
+    def __search_profiles(self, request: Request) -> tuple[Response, int]:
+        """
+        Autocomplete the logins of public users.
+
+        Returns:
+            tuple[Response, int]: The logins as [{"login": ...}] and HTTP status code.
+        """
+        prefix = request.args.get("prefix", "")
+        limit = request.args.get("limit", 10, int)
+
+        # Logins only ever contain these characters, so no LIKE wildcards get through.
+        if not re.fullmatch(r"[a-zA-Z0-9-]{1,30}", prefix):
+            return jsonify({"reason": "Invalid prefix"}), 400
+        if limit > 50 or limit < 0:
+            return jsonify({"reason": "Invalid limit"}), 401
+
+        token = self.token_processing.get_token(request)
+        if token is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        user = self.token_processing.validate_token(token)
+        if user is None:
+            return jsonify({"reason": "Invalid token"}), 401
+
+        logins = self.user_database.search_logins(prefix, limit)
+        return jsonify([{"login": login} for login in logins]), 200
@@ -0,0 +1,73 @@
+import os
+from typing import Any, Dict
+from gunicorn.app.base import BaseApplication
+
+from .app import app, pool, reactions_database, password_hasher
+from .modules.metrics import mark_process_dead
+
+
+class Server(BaseApplication):
+    """
+    A pre-fork gunicorn server for the Flask app.
+
+    The app, its database clients and caches are built once in the master
+    process on import and shared copy-on-write by the forked workers.
+    """
+
+    def __init__(self, options: Dict[str, Any]) -> None:
+        """
+        Initialize the Server with gunicorn settings.
+
+        Args:
+            options (Dict[str, Any]): gunicorn settings, e.g. workers and threads.
+        """
+
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self) -> Any:
+        return app
+
+
+def when_ready(server: Any) -> None:
+    # Connections opened while loading the app must not be shared by workers.
+    pool.close_all()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    password_hasher.start()  # fork the hashing processes before request threads exist
+
+
+def worker_exit(server: Any, worker: Any) -> None:
+    reactions_database.close()  # flush buffered reactions before the worker dies
+    password_hasher.close()
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    mark_process_dead(worker.pid)  # runs in the master once a worker is gone
+
+
+def main() -> None:
+    options = {
+        "bind": "0.0.0.0:{}".format(os.environ.get("SERVER_PORT", "8080")),
+        "workers": int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        "threads": int(os.environ.get("WEB_THREADS", "4")),
+        "max_requests": int(os.environ.get("WEB_MAX_REQUESTS", "10000")),
+        "max_requests_jitter": int(os.environ.get("WEB_MAX_REQUESTS_JITTER", "1000")),
+        "timeout": int(os.environ.get("WEB_TIMEOUT", "30")),
+        "graceful_timeout": int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30")),
+        "preload_app": True,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "child_exit": child_exit,
+    }
+    Server(options).run()  # SIGHUP gracefully replaces the workers
+
+
+if __name__ == "__main__":
+    main()